@@ -3,35 +3,103 @@
 YouTube Downloader - Version Web avec Playlists, Historique et Progression
 """
 
-from flask import Flask, render_template, request, jsonify, send_file, abort
+from flask import Flask, render_template, request, jsonify, send_file, abort, redirect
 from pathlib import Path
-import yt_dlp
 import os
+import shutil
 import threading
 import time
 import zipfile
 import re
 import urllib.parse
 import json
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from scheduler import DownloadScheduler, DiskQuota, LANE_PRIORITY, LANE_BATCH
+from storage import get_uploader
+from profiling import SamplingProfiler
+from thumbnails import create_thumbnail_cache, thumb_url, ThumbnailNotFound, VIDEO_ID_RE
+from retry import (BreakerRegistry, breaker_key, classify_error, backoff_delay,
+                   MAX_ATTEMPTS, PERMANENT)
 
 app = Flask(__name__)
 
+# Nombre de proxys de confiance devant l'application (Render : 1). Seules leurs
+# entrées X-Forwarded-For sont prises en compte pour l'adresse du client.
+PROXY_HOPS = int(os.environ.get('PROXY_HOPS', '0'))
+if PROXY_HOPS:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS, x_proto=PROXY_HOPS)
+
 BASE_DIR = Path(__file__).parent
-DOWNLOAD_DIR = BASE_DIR / "downloads"
-DOWNLOAD_DIR.mkdir(exist_ok=True)
-HISTORY_FILE = BASE_DIR / "history.json"
-SETTINGS_FILE = BASE_DIR / "settings.json"
+DOWNLOAD_DIR = Path(os.environ.get('DOWNLOAD_DIR', BASE_DIR / "downloads"))
+DATA_DIR = Path(os.environ.get('DATA_DIR', BASE_DIR))
+HISTORY_FILE = DATA_DIR / "history.json"
+# Profils des tâches, à côté des fichiers produits (ignorés par la liste des fichiers)
+PROFILE_DIR = DOWNLOAD_DIR / ".profiles"
+SETTINGS_FILE = DATA_DIR / "settings.json"
 
 # Status des téléchargements en cours
 download_status = {}
 
+# Créneaux de téléchargement et bande passante partagés entre toutes les tâches
+scheduler = DownloadScheduler()
+# Disjoncteurs par hôte : suspendent les lots quand la source est indisponible
+breakers = BreakerRegistry()
+
+# Infos de playlists récentes, pour servir les pages de la liste sans ré-extraire
+PLAYLIST_CACHE_SIZE = 16
+PLAYLIST_CACHE_TTL = 600
+playlist_cache = OrderedDict()
+playlist_cache_lock = threading.Lock()
+
+# Dernier parcours du dossier de téléchargement (rafraîchi si le dossier change)
+FILES_CACHE_TTL = 2.0
+files_cache = {'key': None, 'time': 0, 'files': []}
+disk_quota = DiskQuota(DOWNLOAD_DIR)
+
+# Miniatures servies par /thumb/<id>, en cache à côté des fichiers produits
+thumbnails = create_thumbnail_cache(Path(os.environ.get('THUMB_CACHE_DIR', DOWNLOAD_DIR / ".thumbnails")))
+THUMB_MAX_AGE = 7 * 24 * 3600
+
+QUALITY_HEIGHTS = {
+    '4k': 2160,
+    '1440': 1440,
+    '1080': 1080,
+    '720': 720,
+    '480': 480,
+    '360': 360,
+}
+
+# Débits moyens (kbit/s) pour estimer la taille quand yt-dlp n'en donne pas
+VIDEO_BITRATES = {2160: 20000, 1440: 10000, 1080: 5000, 720: 2500, 480: 1200, 360: 700}
+WAV_BITRATE = 1411
+NATIVE_AUDIO_BITRATE = 160
+
+# Profils de téléchargement : fragments DASH/HLS simultanés, taille des morceaux HTTP
+# (contourne le bridage des longs flux) et délégation à aria2c s'il est installé
+DOWNLOAD_PROFILES = {
+    'standard': {'fragments': 1, 'chunk_mb': 0, 'aria2c': False},
+    'parallel': {'fragments': 4, 'chunk_mb': 10, 'aria2c': False},
+    'turbo': {'fragments': 8, 'chunk_mb': 10, 'aria2c': True},
+}
+# Profil de chaque classe de qualité (modifiable dans les paramètres)
+DEFAULT_QUALITY_PROFILES = {'audio': 'standard', 'sd': 'standard', 'hd': 'parallel', 'uhd': 'parallel'}
+quality_profiles = dict(DEFAULT_QUALITY_PROFILES)
+
 
 def load_settings():
     """Charge les paramètres depuis le fichier JSON"""
     default_settings = {
         'auto_cleanup_enabled': False,
-        'cleanup_days': 7
+        'cleanup_days': 7,
+        'max_concurrent_downloads': 2,
+        'bandwidth_limit_kb': 0,
+        'disk_quota_mb': 0,
+        'shortest_first': False,
+        'profiling_enabled': False,
+        'max_connections': 16,
+        **{f'download_profile_{c}': p for c, p in DEFAULT_QUALITY_PROFILES.items()}
     }
     if SETTINGS_FILE.exists():
         try:
@@ -49,11 +117,38 @@ def save_settings(settings):
         json.dump(settings, f, ensure_ascii=False, indent=2)
 
 
+def apply_scheduler_settings(settings):
+    """Applique les limites de l'ordonnanceur, du quota disque (0 = illimité)
+    et les profils de téléchargement"""
+    scheduler.configure(
+        max_slots=settings.get('max_concurrent_downloads', 2),
+        bandwidth_limit=int(settings.get('bandwidth_limit_kb', 0) or 0) * 1024,
+        max_connections=settings.get('max_connections', 16)
+    )
+    disk_quota.limit = int(settings.get('disk_quota_mb', 0) or 0) * 2**20
+    for c in DEFAULT_QUALITY_PROFILES:
+        profile = settings.get(f'download_profile_{c}')
+        if profile in DOWNLOAD_PROFILES:
+            quality_profiles[c] = profile
+
+
+def client_id():
+    """Identifie le client à l'origine de la requête (pour le partage équitable) ;
+    derrière un proxy, remote_addr est corrigé par ProxyFix (PROXY_HOPS)"""
+    return request.remote_addr or 'local'
+
+
+def ensure_download_dir():
+    """Crée le dossier de téléchargement à la première utilisation (pas à l'import)"""
+    DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+
 def cleanup_old_files(days=7):
     """Supprime les fichiers plus vieux que X jours"""
     cutoff = datetime.now() - timedelta(days=days)
     deleted = []
 
+    ensure_download_dir()
     for f in DOWNLOAD_DIR.iterdir():
         if f.is_file() and f.name != '.gitkeep':
             file_time = datetime.fromtimestamp(f.stat().st_mtime)
@@ -61,9 +156,20 @@ def cleanup_old_files(days=7):
                 try:
                     f.unlink()
                     deleted.append(f.name)
+                    get_uploader().storage.delete(f.name)
                 except:
                     pass
 
+    # Profils des tâches (.profiles/), jamais envoyés au stockage distant
+    if PROFILE_DIR.is_dir():
+        for f in PROFILE_DIR.iterdir():
+            if f.is_file() and datetime.fromtimestamp(f.stat().st_mtime) < cutoff:
+                try:
+                    f.unlink()
+                    deleted.append(f"{PROFILE_DIR.name}/{f.name}")
+                except OSError:
+                    pass
+
     return deleted
 
 
@@ -112,6 +218,20 @@ def add_to_history(title, filename, format_type, url="", is_playlist=False, play
     return entry
 
 
+# Formats audio ré-encodés par FFmpeg
+TRANSCODED_AUDIO_FORMATS = {'mp3', 'wav'}
+# Formats audio natifs : simple remux du meilleur flux, sans décodage ('audio' = codec d'origine)
+PASSTHROUGH_AUDIO_FORMATS = {
+    'm4a': 'bestaudio[ext=m4a]/bestaudio[acodec^=mp4a]/bestaudio/best',
+    'opus': 'bestaudio[acodec=opus]/bestaudio/best',
+    'audio': 'bestaudio/best',
+}
+AUDIO_FORMATS = TRANSCODED_AUDIO_FORMATS | set(PASSTHROUGH_AUDIO_FORMATS)
+# Extensions que FFmpegExtractAudio garde telles quelles en mode 'best' (pas de remux)
+COMMON_AUDIO_EXTENSIONS = {'aiff', 'alac', 'flac', 'm4a', 'mka', 'mp3', 'ogg', 'opus', 'wav'}
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.opus', '.ogg', '.webm', '.aac', '.flac'}
+
+
 def sanitize_filename(filename):
     """Nettoie le nom de fichier"""
     filename = re.sub(r'[<>:"/\\|?*\'\"]', '_', filename)
@@ -121,8 +241,197 @@ def sanitize_filename(filename):
     return filename.strip()
 
 
-def get_video_info(url):
-    """Récupère les infos de la vidéo ou playlist"""
+def build_format_options(format_type, quality):
+    """Options yt-dlp de sélection de format et de post-traitement"""
+    if format_type in PASSTHROUGH_AUDIO_FORMATS:
+        # FFmpegExtractAudio copie le flux quand le codec correspond déjà
+        return {
+            'format': PASSTHROUGH_AUDIO_FORMATS[format_type],
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'best' if format_type == 'audio' else format_type,
+            }],
+        }
+
+    if format_type in TRANSCODED_AUDIO_FORMATS:
+        return {
+            'format': 'bestaudio/best',
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': format_type,
+                'preferredquality': quality,
+            }],
+        }
+
+    height = QUALITY_HEIGHTS.get(quality)
+    if quality == "best" or not height:
+        format_str = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+    else:
+        format_str = f'bestvideo[height<={height}][ext=mp4]+bestaudio[ext=m4a]/best[height<={height}]'
+
+    return {
+        'format': format_str,
+        'merge_output_format': 'mp4',
+    }
+
+
+def quality_class(format_type, quality):
+    """Classe de qualité (audio, sd, hd, uhd) qui choisit le profil de téléchargement"""
+    if format_type in AUDIO_FORMATS:
+        return 'audio'
+    height = QUALITY_HEIGHTS.get(quality)
+    if quality == 'best' or not height or height > 1080:
+        return 'uhd'
+    return 'hd' if height >= 720 else 'sd'
+
+
+def download_profile_options(format_type, quality, ratelimit=None):
+    """Options yt-dlp du profil de la qualité demandée ; le nombre de fragments
+    simultanés est borné par la part de connexions de ce téléchargement"""
+    profile = DOWNLOAD_PROFILES[quality_profiles[quality_class(format_type, quality)]]
+    fragments = scheduler.connections(profile['fragments'])
+    options = {'concurrent_fragment_downloads': fragments}
+    if profile['chunk_mb']:
+        options['http_chunk_size'] = profile['chunk_mb'] * 2**20
+
+    if profile['aria2c'] and shutil.which('aria2c'):
+        args = ['-x', str(fragments), '-s', str(fragments), '-k', '1M']
+        if ratelimit:
+            # aria2c ignore l'option ratelimit de yt-dlp
+            args.append(f'--max-overall-download-limit={ratelimit}')
+        options['external_downloader'] = {'default': 'aria2c'}
+        options['external_downloader_args'] = {'aria2c': args}
+    return options
+
+
+def selected_formats(ydl, info, format_str):
+    """Formats que yt-dlp retiendrait pour format_str (liste vide si indisponible)"""
+    formats = info.get('formats') or []
+    if not formats:
+        return [info]
+    try:
+        selector = ydl.build_format_selector(format_str)
+        chosen = list(selector({
+            'formats': formats,
+            'has_merged_format': any(f.get('acodec') != 'none' and f.get('vcodec') != 'none' for f in formats),
+            'incomplete_formats': False,
+        }))
+    except Exception:
+        return []
+    return [f for c in chosen for f in (c.get('requested_formats') or [c])]
+
+
+def estimate_from_duration(duration, format_type, quality):
+    """Taille approximative d'après la durée et le débit attendu"""
+    if not duration:
+        return 0
+    if format_type == 'wav':
+        kbps = WAV_BITRATE
+    elif format_type in PASSTHROUGH_AUDIO_FORMATS:
+        kbps = NATIVE_AUDIO_BITRATE
+    elif format_type in AUDIO_FORMATS:
+        kbps = int(quality) if str(quality).isdigit() else 192
+    else:
+        kbps = VIDEO_BITRATES.get(QUALITY_HEIGHTS.get(quality), VIDEO_BITRATES[1080])
+    return int(duration * kbps * 1000 / 8)
+
+
+def needs_remux(formats, format_type):
+    """Le remux d'un format audio natif écrira-t-il une copie ? (non si l'extension convient déjà)"""
+    ext = formats[0].get('ext') if formats else None
+    if not ext:
+        return True
+    if format_type == 'audio':
+        return ext not in COMMON_AUDIO_EXTENSIONS
+    return ext != format_type
+
+
+def estimate_filesize(formats, duration, format_type, quality):
+    """Octets nécessaires sur disque pour le téléchargement et la conversion éventuelle"""
+    downloaded = 0
+    for f in formats:
+        size = f.get('filesize') or f.get('filesize_approx')
+        if not size:
+            # Taille inconnue pour au moins un flux : estimation par le débit
+            downloaded = 0
+            break
+        downloaded += size
+
+    if format_type in PASSTHROUGH_AUDIO_FORMATS:
+        size = downloaded or estimate_from_duration(duration, format_type, quality)
+        # Le remux (ex. opus dans webm -> .opus) écrit une copie du flux à côté de la source
+        return 2 * size if needs_remux(formats, format_type) else size
+    if format_type in AUDIO_FORMATS:
+        # Le flux source et le fichier converti coexistent pendant la conversion
+        return downloaded + estimate_from_duration(duration, format_type, quality)
+    return downloaded or estimate_from_duration(duration, format_type, quality)
+
+
+def parse_timestamp(value):
+    """Convertit '1:02:03', '62:03' ou 3723 en secondes"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    seconds = 0.0
+    for part in str(value).strip().split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_clip(data):
+    """Extrait les plages horaires et chapitres demandés (None = vidéo entière)"""
+    ranges = []
+    for section in data.get('sections') or []:
+        start = parse_timestamp(section.get('start') or 0)
+        end = section.get('end')
+        end = parse_timestamp(end) if end not in (None, '') else float('inf')
+        if end <= start:
+            raise ValueError(f"Plage invalide: {section.get('start')} - {section.get('end')}")
+        ranges.append((start, end))
+
+    # Titres saisis tels quels : yt-dlp les applique comme expressions régulières
+    chapters = [c.strip() for c in data.get('chapters') or [] if c and c.strip()]
+    if not ranges and not chapters:
+        return None
+    return {
+        'ranges': ranges,
+        'chapters': chapters,
+        'precise': bool(data.get('precise_cuts', False)),
+    }
+
+
+def order_shortest_first(videos):
+    """Trie les vidéos par durée croissante, durées inconnues en dernier"""
+    return sorted(videos, key=lambda v: (not v.get('duration'), v.get('duration') or 0))
+
+
+def probe_durations(urls):
+    """Durée de chaque URL (extraction sans sélection de format), None si inconnue"""
+    import yt_dlp
+
+    durations = {}
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'noplaylist': True}) as ydl:
+        for url in urls:
+            try:
+                durations[url] = ydl.extract_info(url, download=False, process=False).get('duration')
+            except Exception:
+                # L'erreur sera signalée au téléchargement
+                durations[url] = None
+    return durations
+
+
+def warm_up():
+    """Charge yt-dlp et ses extracteurs à l'avance (voir gunicorn.conf.py)"""
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+        ydl.get_info_extractor('Youtube')
+
+
+def get_video_info(url, format_type='mp3', quality='192'):
+    """Récupère les infos de la vidéo ou playlist, avec la taille estimée pour le format choisi"""
+    # Import différé : yt-dlp est lourd et inutile pour servir l'interface
+    import yt_dlp
+
     options = {
         'quiet': True,
         'extract_flat': 'in_playlist',
@@ -135,11 +444,13 @@ def get_video_info(url):
             videos = []
             for entry in info['entries']:
                 if entry:
+                    duration = entry.get('duration', 0) or 0
                     videos.append({
                         'id': entry.get('id', ''),
                         'title': entry.get('title', 'Unknown'),
                         'url': entry.get('url') or f"https://www.youtube.com/watch?v={entry.get('id', '')}",
-                        'duration': entry.get('duration', 0) or 0,
+                        'duration': duration,
+                        'estimated_size': estimate_from_duration(duration, format_type, quality),
                     })
             return {
                 'type': 'playlist',
@@ -147,172 +458,365 @@ def get_video_info(url):
                 'channel': info.get('channel', info.get('uploader', 'Unknown')),
                 'count': len(videos),
                 'videos': videos,
-                'thumbnail': info.get('thumbnails', [{}])[-1].get('url', '') if info.get('thumbnails') else '',
+                'estimated_size': sum(v['estimated_size'] for v in videos),
+                'thumbnail': thumb_url(fallback=info.get('thumbnails', [{}])[-1].get('url', '') if info.get('thumbnails') else ''),
             }
         else:
             duration = info.get('duration', 0) or 0
             minutes, seconds = divmod(duration, 60)
+            formats = selected_formats(ydl, info, build_format_options(format_type, quality)['format'])
             return {
                 'type': 'video',
                 'title': info.get('title', 'Unknown'),
                 'channel': info.get('channel', info.get('uploader', 'Unknown')),
                 'duration': f"{minutes}:{seconds:02d}",
-                'thumbnail': info.get('thumbnail', ''),
+                'duration_seconds': duration,
+                'estimated_size': estimate_filesize(formats, duration, format_type, quality),
+                'thumbnail': thumb_url(info.get('id') if info.get('extractor_key') == 'Youtube' else None,
+                                       info.get('thumbnail', '')),
             }
 
 
-def download_single(url, format_type, quality, task_id=None, update_progress=None):
-    """Télécharge une seule vidéo"""
-    audio_formats = {'mp3', 'wav'}
-    ext = format_type if format_type in audio_formats else 'mp4'
+def get_cached_info(url, format_type='mp3', quality='192'):
+    """get_video_info avec un cache LRU pour les playlists (pagination, téléchargement)"""
+    key = (url, format_type, quality)
+    with playlist_cache_lock:
+        cached = playlist_cache.get(key)
+        if cached and time.time() - cached[0] < PLAYLIST_CACHE_TTL:
+            playlist_cache.move_to_end(key)
+            return cached[1]
 
-    def progress_hook(d):
-        if d['status'] == 'downloading' and update_progress:
-            percent_str = d.get('_percent_str', '0%').strip()
-            speed_str = d.get('_speed_str', 'N/A')
-            update_progress(percent_str, speed_str)
+    info = get_video_info(url, format_type, quality)
+    if info['type'] == 'playlist':
+        with playlist_cache_lock:
+            playlist_cache[key] = (time.time(), info)
+            playlist_cache.move_to_end(key)
+            while len(playlist_cache) > PLAYLIST_CACHE_SIZE:
+                playlist_cache.popitem(last=False)
+    return info
 
-    if format_type in audio_formats:
-        options = {
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': format_type,
-                'preferredquality': quality,
-            }],
-            'outtmpl': str(DOWNLOAD_DIR / '%(title)s.%(ext)s'),
-            'noplaylist': True,
-            'progress_hooks': [progress_hook],
-        }
-    else:
-        quality_map = {
-            '4k': 2160,
-            '1440': 1440,
-            '1080': 1080,
-            '720': 720,
-            '480': 480,
-            '360': 360,
-        }
-        height = quality_map.get(quality)
 
-        if quality == "best" or not height:
-            format_str = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
-        else:
-            format_str = f'bestvideo[height<={height}][ext=mp4]+bestaudio[ext=m4a]/best[height<={height}]'
+def to_int(value, default=None):
+    """Entier depuis la requête (query string ou JSON), `default` si absent ou invalide"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
 
-        options = {
-            'format': format_str,
-            'outtmpl': str(DOWNLOAD_DIR / '%(title)s.%(ext)s'),
-            'merge_output_format': 'mp4',
-            'noplaylist': True,
-            'progress_hooks': [progress_hook],
-        }
 
-    with yt_dlp.YoutubeDL(options) as ydl:
-        info = ydl.extract_info(url, download=True)
-        title = info.get('title', 'video')
+def paginate(items, args):
+    """Applique ?offset=&limit= à une liste (sans limit : tout)"""
+    offset = max(0, to_int(args.get('offset'), 0))
+    limit = to_int(args.get('limit'))
+    if limit is None:
+        return items[offset:]
+    return items[offset:offset + max(0, limit)]
 
-        # Attendre que le fichier soit écrit
-        time.sleep(0.3)
 
-        # Trouver le fichier le plus récent avec la bonne extension
-        files = [(f, f.stat().st_mtime) for f in DOWNLOAD_DIR.iterdir()
-                 if f.is_file() and f.suffix == f'.{ext}' and not f.name.endswith('.zip')]
+def scan_files():
+    """Fichiers du dossier de téléchargement, du plus récent au plus ancien"""
+    ensure_download_dir()
+    key = DOWNLOAD_DIR.stat().st_mtime_ns
+    now = time.monotonic()
+    if files_cache['key'] == key and now - files_cache['time'] < FILES_CACHE_TTL:
+        return files_cache['files']
 
-        if files:
-            files.sort(key=lambda x: x[1], reverse=True)
-            actual_file = files[0][0]
-            actual_filename = actual_file.name
-        else:
-            actual_filename = f"{sanitize_filename(title)}.{ext}"
+    files = []
+    for f in DOWNLOAD_DIR.iterdir():
+        if f.is_file() and not f.name.startswith('.') and f.name != '.gitkeep':
+            stat = f.stat()
+            files.append({
+                'name': f.name,
+                'size': stat.st_size,
+                'modified': stat.st_mtime,
+                'is_zip': f.suffix == '.zip'
+            })
+    files.sort(key=lambda x: x['modified'], reverse=True)
+    files_cache.update(key=key, time=now, files=files)
+    return files
 
-        return {
-            'title': title,
-            'filename': actual_filename,
-            'url': url
-        }
 
+def download_single(url, format_type, quality, task_id=None, update_progress=None, clip=None):
+    """Télécharge une seule vidéo (ou seulement les extraits de `clip`),
+    si son estimation de taille tient dans le quota disque"""
+    import yt_dlp
+
+    ensure_download_dir()
+    if format_type in AUDIO_FORMATS:
+        extensions = {f'.{format_type}'} if format_type != 'audio' else AUDIO_EXTENSIONS
+    else:
+        extensions = {'.mp4'}
 
-def download_multiple(urls, format_type, quality, task_id, playlist_name=None):
-    """Télécharge plusieurs vidéos avec progression et crée un ZIP"""
-    total = len(urls)
-    downloaded_files = []
-    results = []
-
-    download_status[task_id] = {
-        'status': 'downloading',
-        'total': total,
-        'completed': 0,
-        'current_title': '',
-        'current_progress': '0%',
-        'current_speed': '',
-        'results': [],
-        'zip_file': None
+    # Octets du fichier en cours, total écrit (tous formats) et réservation disque
+    transfer = {'last': 0, 'written': 0, 'reservation': None}
+
+    def progress_hook(d):
+        if d['status'] == 'downloading':
+            # Débiter le seau global avec les octets reçus depuis le dernier appel
+            downloaded = d.get('downloaded_bytes') or 0
+            if downloaded < transfer['last']:
+                transfer['last'] = 0
+            received = downloaded - transfer['last']
+            scheduler.throttle(received)
+            transfer['last'] = downloaded
+            transfer['written'] += received
+            # Ce qui est déjà sur le disque n'est plus compté dans la réservation
+            if transfer['reservation']:
+                transfer['reservation'].written = transfer['written']
+
+            if update_progress:
+                percent_str = d.get('_percent_str', '0%').strip()
+                speed_str = d.get('_speed_str', 'N/A')
+                update_progress(percent_str, speed_str)
+
+    options = {
+        **build_format_options(format_type, quality),
+        'outtmpl': str(DOWNLOAD_DIR / '%(title)s.%(ext)s'),
+        'noplaylist': True,
+        'progress_hooks': [progress_hook],
     }
 
-    def update_progress(percent, speed):
-        download_status[task_id]['current_progress'] = percent
-        download_status[task_id]['current_speed'] = speed
+    ratelimit = scheduler.ratelimit()
+    if ratelimit:
+        options['ratelimit'] = ratelimit
+    options.update(download_profile_options(format_type, quality, ratelimit))
 
-    for i, url in enumerate(urls):
-        url = url.strip()
-        if not url:
-            continue
+    if clip:
+        # Coupe sur images clés (sans ré-encodage) sauf si une coupe précise est demandée
+        options['force_keyframes_at_cuts'] = clip['precise']
+        options['outtmpl'] = str(DOWNLOAD_DIR / '%(title)s [%(section_start)d-%(section_end)d].%(ext)s')
 
-        download_status[task_id]['current_title'] = f"Vidéo {i+1}/{total}"
-        download_status[task_id]['current_progress'] = '0%'
+    with yt_dlp.YoutubeDL(options) as ydl:
+        # Extraction seule d'abord : la taille des formats retenus décide de l'admission
+        info = ydl.extract_info(url, download=False)
+        duration = info.get('duration') or 0
+        estimate = estimate_filesize(info.get('requested_formats') or [info],
+                                     duration, format_type, quality)
+        if clip:
+            titles = [c.get('title') or '' for c in info.get('chapters') or []]
+            missing = [c for c in clip['chapters'] if not any(c.lower() in t.lower() for t in titles)]
+            if missing:
+                raise ValueError(f"Chapitre introuvable: {', '.join(missing)}")
+            # Seuls les segments demandés seront téléchargés ("fin" absente = fin de la vidéo)
+            ranges = [(start, min(end, duration) if duration else end) for start, end in clip['ranges']]
+            chapters = [f"(?i){re.escape(c)}" for c in clip['chapters']]
+            ydl.params['download_ranges'] = yt_dlp.utils.download_range_func(
+                chapters or None, ranges or None)
+            sections = list(ydl.params['download_ranges'](info, ydl))
+            if not sections:
+                raise ValueError("Aucun chapitre ou extrait ne correspond à la sélection")
+            if duration:
+                covered = sum(s.get('end_time', duration) - s.get('start_time', 0) for s in sections)
+                estimate = int(estimate * min(1.0, covered / duration))
+        with disk_quota.admit(estimate) as reservation:
+            transfer['reservation'] = reservation
+            info = ydl.process_ie_result(info, download=True)
+        title = info.get('title', 'video')
 
-        try:
-            result = download_single(url, format_type, quality, task_id, update_progress)
-            results.append({'success': True, **result})
-            download_status[task_id]['results'].append({'success': True, **result})
-
-            # Vérifier que le fichier existe
-            file_path = DOWNLOAD_DIR / result['filename']
-            if file_path.exists():
-                downloaded_files.append(result['filename'])
-                # Ajouter à l'historique
-                add_to_history(
-                    result['title'],
-                    result['filename'],
-                    format_type,
-                    url,
-                    is_playlist=True,
-                    playlist_name=playlist_name or "Multi-Download"
-                )
-        except Exception as e:
-            error_msg = str(e)[:100]
-            results.append({'success': False, 'error': error_msg, 'url': url})
-            download_status[task_id]['results'].append({'success': False, 'error': error_msg})
+        # Chemin final (après post-traitement) fourni par yt-dlp
+        paths = [Path(d['filepath']) for d in info.get('requested_downloads') or [] if d.get('filepath')]
 
-        download_status[task_id]['completed'] = i + 1
+        if paths:
+            actual_filename = paths[0].name
+        else:
+            # Attendre que le fichier soit écrit
+            time.sleep(0.3)
 
-    # Créer le ZIP
-    zip_filename = None
-    if len(downloaded_files) >= 1:
-        download_status[task_id]['current_title'] = "Création du ZIP..."
-        download_status[task_id]['current_progress'] = ''
+            # Trouver le fichier le plus récent avec la bonne extension
+            files = [(f, f.stat().st_mtime) for f in DOWNLOAD_DIR.iterdir()
+                     if f.is_file() and f.suffix in extensions and not f.name.endswith('.zip')]
 
-        safe_name = sanitize_filename(playlist_name or "download")
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        zip_filename = f"{safe_name}_{timestamp}.zip"
-        zip_path = DOWNLOAD_DIR / zip_filename
+            if files:
+                files.sort(key=lambda x: x[1], reverse=True)
+                actual_file = files[0][0]
+                actual_filename = actual_file.name
+            else:
+                actual_filename = f"{sanitize_filename(title)}{min(extensions)}"
+
+        result = {
+            'title': title,
+            'filename': actual_filename,
+            'url': url
+        }
+        if clip:
+            # Un fichier par extrait ou chapitre
+            result['files'] = [p.name for p in paths] or [actual_filename]
+        return result
+
+
+def download_with_retries(url, format_type, quality, task_id, update_progress, clip, owner, on_wait, label):
+    """Télécharge un élément d'un lot : reprises avec délai exponentiel sur les erreurs
+    temporaires, pause tant que le disjoncteur de l'hôte est ouvert"""
+    status = download_status[task_id]
+    key = breaker_key(url)
+    breaker = breakers.get(key)
+    attempt = 0
+
+    while True:
+        wait = breaker.wait_time()
+        while wait > 0:
+            status['status'] = 'paused'
+            status['breaker'] = {'host': key, **breaker.snapshot()}
+            status['current_title'] = f"{key} indisponible, reprise dans {int(wait) + 1}s"
+            time.sleep(min(wait, 1.0))
+            wait = breaker.wait_time()
+        status['status'] = 'downloading'
+        status['breaker'] = None
 
         try:
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-                for filename in downloaded_files:
-                    file_path = DOWNLOAD_DIR / filename
-                    if file_path.exists():
-                        zf.write(file_path, filename)
-
-            # Vérifier que le ZIP a été créé
-            if zip_path.exists() and zip_path.stat().st_size > 0:
-                print(f"ZIP créé: {zip_filename} ({zip_path.stat().st_size} bytes)")
+            # Un créneau par vidéo : les autres tâches passent entre deux éléments
+            with scheduler.slot(owner or task_id, LANE_BATCH, on_wait=on_wait):
+                status['current_title'] = label
+                result = download_single(url, format_type, quality, task_id, update_progress, clip)
+            breaker.record_success()
+            status['retry'] = None
+            return result
+        except Exception as e:
+            attempt += 1
+            kind = classify_error(e)
+            if kind == PERMANENT:
+                # L'hôte a répondu : ce n'est pas une panne de la source
+                breaker.record_success()
             else:
+                breaker.record_failure()
+            if kind == PERMANENT or attempt >= MAX_ATTEMPTS:
+                status['retry'] = None
+                e.attempts = attempt
+                raise
+
+            delay = backoff_delay(attempt, kind)
+            status['retries'] += 1
+            status['retry'] = {
+                'attempt': attempt + 1,
+                'max_attempts': MAX_ATTEMPTS,
+                'error_type': kind,
+                'delay': round(delay, 1),
+                'error': str(e)[:100],
+            }
+            status['current_title'] = f"{label} - nouvel essai {attempt + 1}/{MAX_ATTEMPTS} dans {delay:.0f}s"
+            time.sleep(delay)
+
+
+def download_multiple(urls, format_type, quality, task_id, playlist_name=None, owner=None, clip=None,
+                      profile=False, shortest_first=False):
+    """Télécharge plusieurs vidéos avec progression et crée un ZIP (profilé si `profile`).
+    Avec `shortest_first`, les URLs sont d'abord triées par durée (liste d'URLs libres :
+    les playlists sont triées en amont avec les durées de l'extraction à plat)."""
+    profiler = SamplingProfiler(PROFILE_DIR / f"{task_id}.folded").start() if profile else None
+    try:
+        total = len(urls)
+        downloaded_files = []
+        results = []
+        uploads = []
+        uploader = get_uploader()
+
+        download_status[task_id] = {
+            'status': 'downloading',
+            'total': total,
+            'completed': 0,
+            'current_title': '',
+            'current_progress': '0%',
+            'current_speed': '',
+            'results': [],
+            'zip_file': None,
+            'retries': 0,
+            'retry': None,
+            'breaker': None,
+            'profile': None
+        }
+
+        def update_progress(percent, speed):
+            download_status[task_id]['current_progress'] = percent
+            download_status[task_id]['current_speed'] = speed
+
+        def on_wait(position):
+            download_status[task_id]['current_title'] = f"En attente d'un créneau ({position} avant)"
+
+        if shortest_first:
+            # Plus courtes d'abord : minimise le temps moyen d'achèvement
+            download_status[task_id]['current_title'] = "Tri des vidéos par durée..."
+            urls = [u.strip() for u in urls if u.strip()]
+            durations = probe_durations(urls)
+            urls = [v['url'] for v in order_shortest_first([{'url': u, 'duration': durations[u]} for u in urls])]
+            total = download_status[task_id]['total'] = len(urls)
+
+        for i, url in enumerate(urls):
+            url = url.strip()
+            if not url:
+                continue
+
+            download_status[task_id]['current_progress'] = '0%'
+
+            try:
+                result = download_with_retries(url, format_type, quality, task_id, update_progress,
+                                               clip, owner, on_wait, f"Vidéo {i+1}/{total}")
+                results.append({'success': True, **result})
+                download_status[task_id]['results'].append({'success': True, **result})
+
+                # Vérifier que le fichier existe
+                file_path = DOWNLOAD_DIR / result['filename']
+                if file_path.exists():
+                    for filename in result.get('files', [result['filename']]):
+                        downloaded_files.append(filename)
+                        # Envoi en arrière-plan pendant que la vidéo suivante se télécharge
+                        uploads.append(uploader.submit(DOWNLOAD_DIR / filename))
+                        # Ajouter à l'historique
+                        add_to_history(
+                            result['title'],
+                            filename,
+                            format_type,
+                            url,
+                            is_playlist=True,
+                            playlist_name=playlist_name or "Multi-Download"
+                        )
+            except Exception as e:
+                error_msg = str(e)[:100]
+                error_info = {'error_type': classify_error(e), 'attempts': getattr(e, 'attempts', 1)}
+                results.append({'success': False, 'error': error_msg, 'url': url, **error_info})
+                download_status[task_id]['results'].append({'success': False, 'error': error_msg, **error_info})
+
+            download_status[task_id]['completed'] = i + 1
+
+        # Créer le ZIP
+        zip_filename = None
+        if len(downloaded_files) >= 1:
+            download_status[task_id]['current_title'] = "Création du ZIP..."
+            download_status[task_id]['current_progress'] = ''
+
+            safe_name = sanitize_filename(playlist_name or "download")
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            zip_filename = f"{safe_name}_{timestamp}.zip"
+            zip_path = DOWNLOAD_DIR / zip_filename
+
+            try:
+                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+                    for filename in downloaded_files:
+                        file_path = DOWNLOAD_DIR / filename
+                        if file_path.exists():
+                            zf.write(file_path, filename)
+
+                # Vérifier que le ZIP a été créé
+                if zip_path.exists() and zip_path.stat().st_size > 0:
+                    print(f"ZIP créé: {zip_filename} ({zip_path.stat().st_size} bytes)")
+                    uploads.append(uploader.submit(zip_path))
+                else:
+                    zip_filename = None
+            except Exception as e:
+                print(f"Erreur ZIP: {e}")
                 zip_filename = None
-        except Exception as e:
-            print(f"Erreur ZIP: {e}")
-            zip_filename = None
+
+        # Attendre les envois pour que les liens redirigent vers le stockage objet
+        pending = [u for u in uploads if u is not None]
+        if pending:
+            download_status[task_id]['current_title'] = "Envoi vers le stockage..."
+            for upload in pending:
+                upload.result()
+    finally:
+        # Arrêt et écriture du profil même si la tâche échoue
+        if profiler:
+            profiler.stop()
+            if task_id in download_status:
+                download_status[task_id]['profile'] = f"/api/profile/{task_id}"
 
     download_status[task_id]['status'] = 'completed'
     download_status[task_id]['zip_file'] = zip_filename
@@ -321,6 +825,9 @@ def download_multiple(urls, format_type, quality, task_id, playlist_name=None):
     return results
 
 
+apply_scheduler_settings(load_settings())
+
+
 # ============ ROUTES ============
 
 @app.route('/')
@@ -332,12 +839,35 @@ def index():
 def api_info():
     try:
         url = request.json.get('url')
-        info = get_video_info(url)
+        format_type = request.json.get('format', 'mp3')
+        quality = request.json.get('quality', '192')
+        limit = request.json.get('limit')
+        info = get_cached_info(url, format_type, quality)
+        if info['type'] == 'playlist' and limit:
+            # Première page seulement, la suite via /api/playlist/page
+            info = {**info, 'videos': info['videos'][:int(limit)]}
         return jsonify({'success': True, 'data': info})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 
+@app.route('/api/playlist/page', methods=['POST'])
+def api_playlist_page():
+    """Une page des vidéos d'une playlist"""
+    try:
+        data = request.json
+        info = get_cached_info(data.get('url'), data.get('format', 'mp3'), data.get('quality', '192'))
+        if info['type'] != 'playlist':
+            return jsonify({'success': False, 'error': 'Ce n\'est pas une playlist'})
+        return jsonify({
+            'success': True,
+            'videos': paginate(info['videos'], data),
+            'total': len(info['videos'])
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
 @app.route('/api/download', methods=['POST'])
 def api_download():
     try:
@@ -345,22 +875,29 @@ def api_download():
         urls = data.get('urls', [])
         format_type = data.get('format', 'mp3')
         quality = data.get('quality', '192')
+        shortest_first = data.get('shortest_first', load_settings().get('shortest_first', False))
+        clip = parse_clip(data)
+        profile = data.get('profile', load_settings().get('profiling_enabled', False))
 
         task_id = f"task_{int(time.time() * 1000)}"
+        owner = client_id()
 
         if len(urls) == 1:
             url = urls[0]
 
             # Vérifier si c'est une playlist
             if 'list=' in url or '/playlist' in url:
-                info = get_video_info(url)
+                info = get_cached_info(url, format_type, quality)
                 if info['type'] == 'playlist':
-                    video_urls = [v['url'] for v in info['videos']]
+                    videos = info['videos']
+                    if shortest_first:
+                        videos = order_shortest_first(videos)
+                    video_urls = [v['url'] for v in videos]
                     playlist_name = info['title']
 
                     thread = threading.Thread(
                         target=download_multiple,
-                        args=(video_urls, format_type, quality, task_id, playlist_name)
+                        args=(video_urls, format_type, quality, task_id, playlist_name, owner, clip, profile)
                     )
                     thread.start()
 
@@ -371,18 +908,29 @@ def api_download():
                         'playlist_title': playlist_name
                     })
 
-            # Vidéo simple
-            result = download_single(url, format_type, quality)
-
-            # Ajouter à l'historique
-            add_to_history(result['title'], result['filename'], format_type, url)
+            # Vidéo simple : couloir prioritaire, ne patiente pas derrière les playlists
+            profiler = SamplingProfiler(PROFILE_DIR / f"{task_id}.folded").start() if profile else None
+            try:
+                with scheduler.slot(owner, LANE_PRIORITY):
+                    result = download_single(url, format_type, quality, clip=clip)
+            finally:
+                if profiler:
+                    profiler.stop()
+            if profiler:
+                result['profile'] = f"/api/profile/{task_id}"
+
+            # Ajouter à l'historique (une entrée par extrait ou chapitre)
+            for filename in result.get('files', [result['filename']]):
+                add_to_history(result['title'], filename, format_type, url)
+                get_uploader().submit(DOWNLOAD_DIR / filename)
 
             return jsonify({'success': True, 'data': result})
         else:
-            # Multi-téléchargement
+            # Multi-téléchargement (tri par durée dans la tâche : une extraction par URL)
             thread = threading.Thread(
                 target=download_multiple,
-                args=(urls, format_type, quality, task_id, "Multi-Download")
+                args=(urls, format_type, quality, task_id, "Multi-Download", owner, clip, profile),
+                kwargs={'shortest_first': shortest_first}
             )
             thread.start()
             return jsonify({'success': True, 'task_id': task_id, 'total': len(urls)})
@@ -399,10 +947,13 @@ def api_download_playlist():
         format_type = data.get('format', 'mp3')
         quality = data.get('quality', '192')
         selected = data.get('selected', [])
+        excluded = set(data.get('excluded', []))
+        shortest_first = data.get('shortest_first', load_settings().get('shortest_first', False))
+        profile = data.get('profile', load_settings().get('profiling_enabled', False))
 
         task_id = f"playlist_{int(time.time() * 1000)}"
 
-        info = get_video_info(url)
+        info = get_cached_info(url, format_type, quality)
 
         if info['type'] != 'playlist':
             return jsonify({'success': False, 'error': 'Ce n\'est pas une playlist'})
@@ -410,14 +961,18 @@ def api_download_playlist():
         if selected:
             videos = [v for v in info['videos'] if v['id'] in selected]
         else:
-            videos = info['videos']
+            videos = [v for v in info['videos'] if v['id'] not in excluded]
+
+        if shortest_first:
+            # Plus courtes d'abord : minimise le temps moyen d'achèvement
+            videos = order_shortest_first(videos)
 
         urls = [v['url'] for v in videos]
         playlist_name = info['title']
 
         thread = threading.Thread(
             target=download_multiple,
-            args=(urls, format_type, quality, task_id, playlist_name)
+            args=(urls, format_type, quality, task_id, playlist_name, client_id(), None, profile)
         )
         thread.start()
 
@@ -439,39 +994,72 @@ def api_status(task_id):
     return jsonify({'success': False, 'error': 'Tâche non trouvée'})
 
 
+@app.route('/api/profile/<task_id>')
+def api_profile(task_id):
+    """Profil d'une tâche au format folded (flamegraph.pl, speedscope)"""
+    if not re.fullmatch(r'[\w-]+', task_id):
+        abort(404)
+    profile_path = PROFILE_DIR / f"{task_id}.folded"
+    if not profile_path.exists():
+        abort(404)
+    return send_file(profile_path, as_attachment=True, download_name=f"{task_id}.folded",
+                     mimetype='text/plain')
+
+
+@app.route('/api/scheduler')
+def api_scheduler():
+    """Etat de l'ordonnanceur (créneaux actifs, files d'attente)"""
+    return jsonify({'success': True, 'data': scheduler.stats()})
+
+
 @app.route('/downloads/<path:filename>')
 def serve_file(filename):
     """Sert les fichiers téléchargés"""
     filename = urllib.parse.unquote(filename)
-    file_path = DOWNLOAD_DIR / filename
 
+    # Fichier déjà envoyé vers le stockage objet : le client le récupère directement
+    url = get_uploader().url(filename)
+    if url:
+        return redirect(url)
+
+    file_path = DOWNLOAD_DIR / filename
     if not file_path.exists():
         abort(404)
 
     return send_file(file_path, as_attachment=True, download_name=filename)
 
 
+@app.route('/thumb/<video_id>')
+def serve_thumbnail(video_id):
+    """Miniature d'une vidéo depuis le cache local (réduite avec ?w=<largeur>)"""
+    if not VIDEO_ID_RE.fullmatch(video_id):
+        abort(404)
+    try:
+        data, etag = thumbnails.get(video_id, request.args.get('w', type=int))
+    except ThumbnailNotFound:
+        abort(404)
+    except Exception:
+        abort(502)
+
+    response = app.response_class(data, mimetype='image/jpeg')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = THUMB_MAX_AGE
+    return response.make_conditional(request)
+
+
 @app.route('/api/files')
 def list_files():
-    """Liste les fichiers téléchargés"""
-    files = []
-    for f in DOWNLOAD_DIR.iterdir():
-        if f.is_file() and not f.name.startswith('.') and f.name != '.gitkeep':
-            files.append({
-                'name': f.name,
-                'size': f.stat().st_size,
-                'modified': f.stat().st_mtime,
-                'is_zip': f.suffix == '.zip'
-            })
-    files.sort(key=lambda x: x['modified'], reverse=True)
-    return jsonify({'success': True, 'files': files})
+    """Liste les fichiers téléchargés (paginée avec ?offset=&limit=)"""
+    files = scan_files()
+    return jsonify({'success': True, 'files': paginate(files, request.args), 'total': len(files)})
 
 
 @app.route('/api/history')
 def get_history():
-    """Retourne l'historique des téléchargements"""
+    """Retourne l'historique des téléchargements (paginé avec ?offset=&limit=)"""
     history = load_history()
-    return jsonify({'success': True, 'history': history})
+    return jsonify({'success': True, 'history': paginate(history, request.args), 'total': len(history)})
 
 
 @app.route('/api/history/clear', methods=['POST'])
@@ -489,6 +1077,11 @@ def delete_file():
         file_path = DOWNLOAD_DIR / filename
         if file_path.exists():
             file_path.unlink()
+            try:
+                get_uploader().storage.delete(filename)
+            except Exception as e:
+                # La copie locale est supprimée : une erreur du stockage distant ne fait pas échouer la requête
+                print(f"Erreur de suppression distante {filename}: {e}")
             return jsonify({'success': True})
     return jsonify({'success': False, 'error': 'Fichier non trouvé'})
 
@@ -497,7 +1090,8 @@ def delete_file():
 def get_settings():
     """Retourne les paramètres"""
     settings = load_settings()
-    return jsonify({'success': True, 'settings': settings})
+    return jsonify({'success': True, 'settings': settings,
+                    'aria2c_available': shutil.which('aria2c') is not None})
 
 
 @app.route('/api/settings', methods=['POST'])
@@ -507,6 +1101,7 @@ def update_settings():
     settings = load_settings()
     settings.update(data)
     save_settings(settings)
+    apply_scheduler_settings(settings)
     return jsonify({'success': True, 'settings': settings})
 
 
@@ -563,6 +1158,8 @@ def search_youtube():
         if not query:
             return jsonify({'success': False, 'error': 'Requête vide'})
 
+        import yt_dlp
+
         options = {
             'quiet': True,
             'extract_flat': True,
@@ -580,15 +1177,12 @@ def search_youtube():
                     duration = int(entry.get('duration', 0) or 0)
                     minutes, seconds = divmod(duration, 60)
                     video_id = entry.get('id', '')
-                    thumbnail = entry.get('thumbnail', '')
-                    if not thumbnail and video_id:
-                        thumbnail = f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg"
                     results.append({
                         'id': video_id,
                         'title': entry.get('title', 'Unknown'),
                         'channel': entry.get('channel', entry.get('uploader', 'Unknown')),
                         'duration': f"{minutes}:{seconds:02d}",
-                        'thumbnail': thumbnail,
+                        'thumbnail': thumb_url(video_id, entry.get('thumbnail', '')),
                         'url': f"https://www.youtube.com/watch?v={video_id}",
                         'views': entry.get('view_count', 0),
                     })
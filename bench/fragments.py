@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Banc des fragments simultanés : flux HLS local servi avec latence
+
+Un ThreadingHTTPServer sert une playlist HLS de N segments ; chaque segment
+attend `--latency` avant d'être envoyé à un débit plafonné par connexion,
+comme un CDN distant. Le même flux est téléchargé avec yt-dlp pour chaque
+valeur de concurrent_fragment_downloads et le temps médian est comparé.
+
+Usage:
+    python bench/fragments.py
+    python bench/fragments.py --segments 60 --latency 0.2 --fragments 1,2,4,8
+"""
+
+import argparse
+import re
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from loadtest import free_port
+
+BLOCK_SIZE = 64 * 1024
+
+
+def make_handler(segments, segment_size, latency, rate):
+    """Gestionnaire HTTP servant la playlist et ses segments"""
+    payload = bytes(segment_size)
+    duration = 4
+    playlist = '\n'.join(
+        ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{duration}', '#EXT-X-MEDIA-SEQUENCE:0']
+        + [line for i in range(segments) for line in (f'#EXTINF:{duration}.0,', f'seg{i}.ts')]
+        + ['#EXT-X-ENDLIST', '']).encode()
+
+    class StreamHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if self.path == '/stream.m3u8':
+                self._send(playlist, 'application/vnd.apple.mpegurl')
+            elif re.fullmatch(r'/seg(\d+)\.ts', self.path):
+                time.sleep(latency)
+                self._send(payload, 'video/mp2t', paced=True)
+            else:
+                self.send_error(404)
+
+        def _send(self, body, content_type, paced=False):
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            for offset in range(0, len(body), BLOCK_SIZE):
+                self.wfile.write(body[offset:offset + BLOCK_SIZE])
+                if paced and rate:
+                    time.sleep(BLOCK_SIZE / rate)
+
+        def log_message(self, *args):
+            pass
+
+    return StreamHandler
+
+
+def download(url, fragments, output_dir):
+    """Télécharge le flux avec `fragments` fragments simultanés, renvoie (durée, octets)"""
+    import yt_dlp
+
+    options = {
+        'outtmpl': str(output_dir / f'frag{fragments}.%(ext)s'),
+        'concurrent_fragment_downloads': fragments,
+        'fixup': 'never',
+        'quiet': True,
+        'noprogress': True,
+    }
+    start = time.perf_counter()
+    with yt_dlp.YoutubeDL(options) as ydl:
+        info = ydl.extract_info(url, download=True)
+    elapsed = time.perf_counter() - start
+    path = Path(info['requested_downloads'][0]['filepath'])
+    size = path.stat().st_size
+    path.unlink()
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fragments HLS simultanés : 1 contre N")
+    parser.add_argument('--segments', type=int, default=40, help="Segments dans la playlist")
+    parser.add_argument('--segment-kb', type=int, default=512, help="Taille d'un segment (Ko)")
+    parser.add_argument('--latency', type=float, default=0.15, help="Latence par segment (s)")
+    parser.add_argument('--rate-kb', type=int, default=4096, help="Débit par connexion (Ko/s, 0 = illimité)")
+    parser.add_argument('--fragments', default='1,4,8', help="Valeurs de concurrent_fragment_downloads")
+    parser.add_argument('--runs', type=int, default=3, help="Répétitions par valeur")
+    args = parser.parse_args()
+
+    segment_size = args.segment_kb * 1024
+    handler = make_handler(args.segments, segment_size, args.latency, args.rate_kb * 1024)
+    port = free_port()
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{port}/stream.m3u8'
+    expected = args.segments * segment_size
+
+    print(f"{args.segments} segments de {args.segment_kb} Ko, latence {args.latency * 1000:.0f} ms, "
+          f"{args.rate_kb} Ko/s par connexion")
+    baseline = None
+    try:
+        with tempfile.TemporaryDirectory(prefix='ytdl-frag-') as tmp:
+            for fragments in [int(n) for n in args.fragments.split(',')]:
+                samples = []
+                for _ in range(args.runs):
+                    elapsed, size = download(url, fragments, Path(tmp))
+                    if size != expected:
+                        raise SystemExit(f"Taille inattendue: {size} octets au lieu de {expected}")
+                    samples.append(elapsed)
+                median = statistics.median(samples)
+                baseline = baseline or median
+                print(f"fragments={fragments:<3} : médiane {median:6.2f} s, "
+                      f"{expected / median / 2**20:6.1f} Mo/s, x{baseline / median:.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
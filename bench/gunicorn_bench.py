@@ -0,0 +1,55 @@
+"""
+Configuration gunicorn pour les bancs d'essai (bench/loadtest.py)
+
+Injecte BENCH_TASKS tâches factices dans download_status de chaque worker,
+avec un thread qui fait avancer leur progression comme le ferait download_multiple.
+"""
+
+import os
+import threading
+import time
+
+
+def post_worker_init(worker):
+    import app
+
+    count = int(os.environ.get('BENCH_TASKS', '0'))
+    items = int(os.environ.get('BENCH_TASK_ITEMS', '50'))
+
+    for i in range(count):
+        app.download_status[f"bench_{i}"] = {
+            'status': 'downloading',
+            'total': items,
+            'completed': 0,
+            'current_title': f"Vidéo 1/{items}",
+            'current_progress': '0%',
+            'current_speed': '',
+            'results': [],
+            'zip_file': None
+        }
+
+    def advance():
+        percent = 0
+        while True:
+            time.sleep(0.1)
+            percent = (percent + 5) % 100
+            for i in range(count):
+                status = app.download_status[f"bench_{i}"]
+                status['current_progress'] = f"{percent}%"
+                status['current_speed'] = '2.50MiB/s'
+                if percent == 0:
+                    # Item terminé : on repart au début une fois la tâche pleine
+                    if status['completed'] >= items:
+                        status['completed'] = 0
+                        status['results'] = []
+                    status['completed'] += 1
+                    status['current_title'] = f"Vidéo {status['completed']}/{items}"
+                    status['results'].append({
+                        'success': True,
+                        'title': f"Bench video {status['completed']}",
+                        'filename': f"bench_{status['completed']}.mp3",
+                        'url': 'https://www.youtube.com/watch?v=bench'
+                    })
+
+    if count:
+        threading.Thread(target=advance, daemon=True).start()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Banc de charge de l'API Flask (sous gunicorn)
+
+Simule N clients (onglets de l'interface) qui interrogent en boucle
+/api/status/<task_id>, /api/files et /api/history pendant que M tâches
+tournent, puis affiche latence p50/p95/p99 et débit par endpoint.
+
+Usage:
+    python bench/loadtest.py                             # scénarios par défaut
+    python bench/loadtest.py --clients 50 --tasks 10     # scénario unique
+    python bench/loadtest.py --json out.json             # sauvegarde des résultats
+    python bench/loadtest.py --baseline out.json         # échoue si le p95 régresse
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+ROOT_DIR = BENCH_DIR.parent
+
+ENDPOINTS = ['status', 'files', 'history']
+
+# (nom, clients, tâches, fichiers, entrées d'historique)
+DEFAULT_SCENARIOS = [
+    ('light', 5, 1, 50, 20),
+    ('medium', 25, 4, 500, 100),
+    ('heavy', 100, 10, 2000, 100),
+]
+
+
+def free_port():
+    """Réserve un port TCP libre sur la boucle locale"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed_data(data_dir, download_dir, files, history):
+    """Crée des fichiers factices et un historique dans les dossiers du banc"""
+    for i in range(files):
+        ext = 'zip' if i % 20 == 0 else 'mp3'
+        path = download_dir / f"bench_{i:05d}.{ext}"
+        with open(path, 'wb') as f:
+            f.truncate(1024 * (i % 50 + 1))
+
+    entries = [{
+        'id': 1700000000000 + i,
+        'title': f"Bench video {i}",
+        'filename': f"bench_{i:05d}.mp3",
+        'format': 'mp3',
+        'url': 'https://www.youtube.com/watch?v=bench',
+        'date': '2024-01-01 12:00',
+        'is_playlist': False,
+        'playlist_name': ''
+    } for i in range(history)]
+    with open(data_dir / 'history.json', 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+
+
+def wait_until_ready(port, timeout=30.0, path='/api/files'):
+    """Attend que le serveur réponde, renvoie le temps écoulé en secondes"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', path)
+            if conn.getresponse().status == 200:
+                conn.close()
+                return time.perf_counter() - start
+        except OSError:
+            pass
+        time.sleep(0.02)
+    raise RuntimeError(f"Le serveur n'a pas répondu sur le port {port}")
+
+
+def start_server(port, env, workers=1, threads=1, config=None, extra_args=()):
+    """Lance gunicorn sur app:app et renvoie le processus"""
+    cmd = [sys.executable, '-m', 'gunicorn', 'app:app',
+           '--bind', f'127.0.0.1:{port}',
+           '--workers', str(workers),
+           '--threads', str(threads),
+           '--log-level', 'warning']
+    if config:
+        cmd += ['-c', str(config)]
+    cmd += list(extra_args)
+    return subprocess.Popen(cmd, cwd=ROOT_DIR, env={**os.environ, **env})
+
+
+def percentile(sorted_values, p):
+    """Percentile par rang le plus proche"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def poll_client(port, client_id, tasks, stop, interval, samples, errors, lock):
+    """Un client qui alterne status/files/history comme un onglet ouvert"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    local = {name: [] for name in ENDPOINTS}
+    local_errors = {name: 0 for name in ENDPOINTS}
+    i = client_id
+
+    while not stop.is_set():
+        name = ENDPOINTS[i % len(ENDPOINTS)]
+        if name == 'status':
+            path = f"/api/status/bench_{i % tasks}" if tasks else "/api/status/none"
+        else:
+            path = f"/api/{name}"
+
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                local_errors[name] += 1
+            else:
+                local[name].append(time.perf_counter() - start)
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            local_errors[name] += 1
+            conn.close()
+
+        i += 1
+        if interval:
+            time.sleep(interval)
+
+    conn.close()
+    with lock:
+        for name in ENDPOINTS:
+            samples[name].extend(local[name])
+            errors[name] += local_errors[name]
+
+
+def run_scenario(name, clients, tasks, files, history, duration, interval, workers, threads):
+    """Exécute un scénario complet et renvoie les statistiques par endpoint"""
+    with tempfile.TemporaryDirectory(prefix='ytdl-bench-') as tmp:
+        data_dir = Path(tmp)
+        download_dir = data_dir / 'downloads'
+        download_dir.mkdir()
+        seed_data(data_dir, download_dir, files, history)
+
+        port = free_port()
+        env = {
+            'DATA_DIR': str(data_dir),
+            'DOWNLOAD_DIR': str(download_dir),
+            'BENCH_TASKS': str(tasks),
+        }
+        server = start_server(port, env, workers, threads, config=BENCH_DIR / 'gunicorn_bench.py')
+        try:
+            wait_until_ready(port)
+
+            samples = {n: [] for n in ENDPOINTS}
+            errors = {n: 0 for n in ENDPOINTS}
+            lock = threading.Lock()
+            stop = threading.Event()
+            pool = [threading.Thread(target=poll_client,
+                                     args=(port, c, tasks, stop, interval, samples, errors, lock))
+                    for c in range(clients)]
+            for t in pool:
+                t.start()
+            time.sleep(duration)
+            stop.set()
+            for t in pool:
+                t.join()
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    stats = {}
+    for endpoint in ENDPOINTS:
+        values = sorted(samples[endpoint])
+        stats[endpoint] = {
+            'requests': len(values),
+            'errors': errors[endpoint],
+            'rps': len(values) / duration,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+        }
+    return {
+        'scenario': name,
+        'clients': clients,
+        'tasks': tasks,
+        'files': files,
+        'history': history,
+        'endpoints': stats,
+    }
+
+
+def print_report(result):
+    print(f"\n[{result['scenario']}] {result['clients']} clients, {result['tasks']} tâches, "
+          f"{result['files']} fichiers, {result['history']} entrées d'historique")
+    print(f"  {'endpoint':<10}{'req':>8}{'err':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, s in result['endpoints'].items():
+        print(f"  {endpoint:<10}{s['requests']:>8}{s['errors']:>6}{s['rps']:>10.1f}"
+              f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+
+def compare_to_baseline(results, baseline_path, tolerance):
+    """Renvoie la liste des régressions de p95 au-delà de la tolérance"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {r['scenario']: r for r in json.load(f)}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['scenario'])
+        if not previous:
+            continue
+        for endpoint, s in result['endpoints'].items():
+            before = previous['endpoints'].get(endpoint, {}).get('p95_ms')
+            if before and s['p95_ms'] > before * (1 + tolerance):
+                regressions.append(
+                    f"{result['scenario']}/{endpoint}: p95 {before:.2f} ms -> {s['p95_ms']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de charge des endpoints de polling")
+    parser.add_argument('--clients', type=int, help="Nombre de clients simultanés (scénario unique)")
+    parser.add_argument('--tasks', type=int, default=4, help="Nombre de tâches en cours")
+    parser.add_argument('--files', type=int, default=500, help="Fichiers dans le dossier de téléchargement")
+    parser.add_argument('--history', type=int, default=100, help="Entrées d'historique")
+    parser.add_argument('--duration', type=float, default=10.0, help="Durée de chaque scénario (s)")
+    parser.add_argument('--interval', type=float, default=0.0,
+                        help="Pause entre deux requêtes d'un client (0 = au plus vite)")
+    parser.add_argument('--workers', type=int, default=1, help="Workers gunicorn")
+    parser.add_argument('--threads', type=int, default=1, help="Threads par worker gunicorn")
+    parser.add_argument('--json', help="Fichier où écrire les résultats")
+    parser.add_argument('--baseline', help="Résultats de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Régression de p95 tolérée par rapport à la référence (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.clients:
+        scenarios = [('custom', args.clients, args.tasks, args.files, args.history)]
+    else:
+        scenarios = DEFAULT_SCENARIOS
+
+    results = []
+    for name, clients, tasks, files, history in scenarios:
+        result = run_scenario(name, clients, tasks, files, history,
+                              args.duration, args.interval, args.workers, args.threads)
+        print_report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\nRégressions détectées:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nAucune régression par rapport à la référence")
+
+
+if __name__ == '__main__':
+    main()
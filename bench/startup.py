@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Banc de démarrage : temps entre le lancement de gunicorn et la première réponse
+
+Compare le démarrage par défaut (imports différés), le préchargement (PRELOAD=1)
+et le préchauffage en arrière-plan (WARMUP=1), ainsi que le coût de `import app`.
+
+Usage:
+    python bench/startup.py
+    python bench/startup.py --runs 10 --workers 2 --path /api/files
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from loadtest import ROOT_DIR, free_port, start_server, wait_until_ready
+
+MODES = [
+    ('lazy', {}),
+    ('preload', {'PRELOAD': '1'}),
+    ('warmup', {'WARMUP': '1'}),
+]
+
+
+def import_time(module, runs):
+    """Temps médian d'import d'un module dans un interpréteur neuf"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', f'import {module}'], cwd=ROOT_DIR, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def cold_start(env, workers, path):
+    """Lance gunicorn et mesure le temps jusqu'à la première réponse 200"""
+    port = free_port()
+    start = time.perf_counter()
+    server = start_server(port, env, workers=workers)
+    try:
+        wait_until_ready(port, path=path)
+        return time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps de démarrage à froid")
+    parser.add_argument('--runs', type=int, default=5, help="Répétitions par mode")
+    parser.add_argument('--workers', type=int, default=1, help="Workers gunicorn")
+    parser.add_argument('--path', default='/', help="Requête servant de première réponse")
+    args = parser.parse_args()
+
+    print(f"import python        : {import_time('json', args.runs) * 1000:8.1f} ms")
+    print(f"import app           : {import_time('app', args.runs) * 1000:8.1f} ms")
+    print(f"import yt_dlp        : {import_time('yt_dlp', args.runs) * 1000:8.1f} ms")
+
+    with tempfile.TemporaryDirectory(prefix='ytdl-bench-') as tmp:
+        base_env = {'DATA_DIR': tmp, 'DOWNLOAD_DIR': str(Path(tmp) / 'downloads')}
+        for name, env in MODES:
+            samples = [cold_start({**base_env, **env}, args.workers, args.path) for _ in range(args.runs)]
+            print(f"premier {args.path:<12} [{name:<7}] : médiane {statistics.median(samples) * 1000:8.1f} ms, "
+                  f"max {max(samples) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
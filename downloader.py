@@ -1,18 +1,31 @@
 #!/usr/bin/env python3
 """
 YouTube Downloader - Télécharge des vidéos YouTube en MP3 ou MP4
+
+Usage:
+    python downloader.py                                  # menu interactif
+    python downloader.py batch urls.txt -f mp3 -j 4       # traitement par lots (JSON lines)
+    cat urls.txt | python downloader.py batch - --archive archive.txt
 """
 
 import yt_dlp
+import argparse
+import json
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 
 class YouTubeDownloader:
-    def __init__(self, output_dir: str = "downloads"):
+    def __init__(self, output_dir: str = "downloads", archive: str = None, quiet: bool = False):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        # Fichier d'archive yt-dlp : les vidéos déjà téléchargées sont ignorées
+        self.archive = archive
+        self.quiet = quiet
 
     def get_video_info(self, url: str) -> dict:
         """Récupère les informations de la vidéo"""
@@ -28,7 +41,7 @@ class YouTubeDownloader:
             except Exception as e:
                 raise Exception(f"Erreur lors de la récupération des infos: {e}")
 
-    def download_mp3(self, url: str, quality: str = "192") -> str:
+    def download_mp3(self, url: str, quality: str = "192", progress_callback=None) -> str:
         """Télécharge la vidéo en MP3"""
         options = {
             'format': 'bestaudio/best',
@@ -41,9 +54,9 @@ class YouTubeDownloader:
             'progress_hooks': [self._progress_hook],
         }
 
-        return self._download(url, options)
+        return self._download(url, options, progress_callback)
 
-    def download_mp4(self, url: str, quality: str = "best") -> str:
+    def download_mp4(self, url: str, quality: str = "best", progress_callback=None) -> str:
         """Télécharge la vidéo en MP4"""
         if quality == "best":
             format_str = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
@@ -63,17 +76,55 @@ class YouTubeDownloader:
             'progress_hooks': [self._progress_hook],
         }
 
-        return self._download(url, options)
+        return self._download(url, options, progress_callback)
+
+    def _download(self, url: str, options: dict, progress_callback=None) -> str:
+        """Effectue le téléchargement (None si la vidéo est déjà dans l'archive)"""
+        if self.archive:
+            options['download_archive'] = str(self.archive)
+        if self.quiet:
+            options.update({'quiet': True, 'no_warnings': True, 'noprogress': True})
+            options['progress_hooks'] = []
+        if progress_callback:
+            options['progress_hooks'] = [self._callback_hook(progress_callback)]
 
-    def _download(self, url: str, options: dict) -> str:
-        """Effectue le téléchargement"""
         with yt_dlp.YoutubeDL(options) as ydl:
             try:
-                info = ydl.extract_info(url, download=True)
+                # Extraction seule d'abord : la vérification de l'archive de yt-dlp avant
+                # extraction ne s'applique qu'aux extracteurs qui connaissent l'identifiant
+                info = ydl.extract_info(url, download=False)
+                if info is None or (self.archive and ydl.in_download_archive(info)):
+                    return None
+                info = ydl.process_ie_result(info, download=True)
                 return info.get('title', 'Téléchargement terminé')
             except Exception as e:
                 raise Exception(f"Erreur de téléchargement: {e}")
 
+    @staticmethod
+    def _callback_hook(callback):
+        """Convertit les hooks yt-dlp en événements structurés pour `callback`
+
+        callback reçoit un dict : status ('downloading'/'finished'), downloaded et
+        total (octets, total à None si inconnu), percent (0-100 ou None), speed (octets/s).
+        """
+        def hook(d):
+            if d['status'] not in ('downloading', 'finished'):
+                return
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            if d['status'] == 'finished':
+                percent = 100.0
+            else:
+                percent = downloaded * 100 / total if total else None
+            callback({
+                'status': d['status'],
+                'downloaded': downloaded,
+                'total': total,
+                'percent': percent,
+                'speed': d.get('speed'),
+            })
+        return hook
+
     def _progress_hook(self, d):
         """Affiche la progression du téléchargement"""
         if d['status'] == 'downloading':
@@ -93,6 +144,73 @@ def print_banner():
     """)
 
 
+def read_urls(source: str) -> list:
+    """Lit les URLs d'un fichier ou de stdin ('-'), sans doublons ni commentaires"""
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+    urls = []
+    seen = set()
+    for line in lines:
+        url = line.strip()
+        if url and not url.startswith('#') and url not in seen:
+            seen.add(url)
+            urls.append(url)
+    return urls
+
+
+def batch(args) -> int:
+    """Télécharge une liste d'URLs en parallèle, un résultat JSON par ligne sur stdout"""
+    downloader = YouTubeDownloader(args.output, archive=args.archive, quiet=True)
+    urls = read_urls(args.input)
+    output_lock = threading.Lock()
+    counts = {'ok': 0, 'skipped': 0, 'error': 0}
+
+    def run(url):
+        start = time.perf_counter()
+        try:
+            if args.format == 'mp3':
+                title = downloader.download_mp3(url, args.quality or "192")
+            else:
+                title = downloader.download_mp4(url, args.quality or "best")
+            result = {'url': url, 'status': 'ok' if title is not None else 'skipped', 'title': title}
+        except Exception as e:
+            result = {'url': url, 'status': 'error', 'error': str(e)}
+        result['elapsed'] = round(time.perf_counter() - start, 3)
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(run, url) for url in urls]
+        for future in as_completed(futures):
+            result = future.result()
+            with output_lock:
+                counts[result['status']] += 1
+                print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    print(f"{len(urls)} URLs en {time.perf_counter() - start:.1f}s : {counts['ok']} téléchargées, "
+          f"{counts['skipped']} déjà archivées, {counts['error']} erreurs", file=sys.stderr)
+    return 1 if counts['error'] else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="YouTube Downloader MP3/MP4")
+    subparsers = parser.add_subparsers(dest='command')
+
+    batch_parser = subparsers.add_parser('batch', help="Traitement par lots non interactif")
+    batch_parser.add_argument('input', help="Fichier d'URLs (une par ligne), '-' pour stdin")
+    batch_parser.add_argument('-f', '--format', choices=['mp3', 'mp4'], default='mp3')
+    batch_parser.add_argument('-q', '--quality', help="kbps pour mp3 (128/192/320), hauteur pour mp4 (360/480/720/best)")
+    batch_parser.add_argument('-j', '--jobs', type=int, default=4, help="Téléchargements simultanés")
+    batch_parser.add_argument('-o', '--output', default='downloads', help="Dossier de sortie")
+    batch_parser.add_argument('--archive', help="Fichier d'archive : ignore les vidéos déjà téléchargées")
+
+    return parser.parse_args(argv)
+
+
 def main():
     print_banner()
     downloader = YouTubeDownloader()
@@ -160,4 +278,7 @@ def main():
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'batch':
+        sys.exit(batch(args))
     main()
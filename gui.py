@@ -6,21 +6,61 @@ YouTube Downloader - Interface graphique (Tkinter)
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from downloader import YouTubeDownloader
 
+# Téléchargements simultanés dans la file
+MAX_WORKERS = 3
+# Intervalle de rafraîchissement de la file (ms) : les hooks de progression
+# ne touchent jamais aux widgets, seule la boucle Tk applique les mises à jour
+UPDATE_INTERVAL_MS = 100
+
+
+class QueueRow:
+    """Ligne de la file d'attente : titre, barre de progression, état"""
+
+    def __init__(self, parent, url):
+        self.frame = ttk.Frame(parent, padding=(0, 2))
+        self.frame.pack(fill=tk.X)
+
+        self.title_var = tk.StringVar(value=url)
+        ttk.Label(self.frame, textvariable=self.title_var, width=40).pack(side=tk.LEFT)
+
+        self.progress_bar = ttk.Progressbar(self.frame, mode="determinate", maximum=100, length=160)
+        self.progress_bar.pack(side=tk.LEFT, padx=10)
+
+        self.status_var = tk.StringVar(value="En attente")
+        ttk.Label(self.frame, textvariable=self.status_var, width=18).pack(side=tk.LEFT)
+
+    def apply(self, update):
+        if 'title' in update:
+            self.title_var.set(update['title'])
+        if 'percent' in update:
+            self.progress_bar['value'] = update['percent']
+        if 'status' in update:
+            self.status_var.set(update['status'])
+
 
 class YouTubeDownloaderGUI:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("YouTube Downloader")
-        self.root.geometry("500x400")
-        self.root.resizable(False, False)
+        self.root.geometry("640x600")
+        self.root.minsize(640, 500)
 
         self.downloader = YouTubeDownloader()
-        self.is_downloading = False
+        self.executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+        self.rows = {}
+        self.next_row_id = 0
+        self.finished = 0
+        # Dernier état connu de chaque ligne, écrit par les workers et vidé par _flush_updates
+        self.pending_updates = {}
+        self.updates_lock = threading.Lock()
 
         self.setup_ui()
+        self.root.after(UPDATE_INTERVAL_MS, self._flush_updates)
 
     def setup_ui(self):
         # Frame principal
@@ -35,12 +75,12 @@ class YouTubeDownloaderGUI:
         )
         title_label.pack(pady=(0, 20))
 
-        # URL
-        url_frame = ttk.LabelFrame(main_frame, text="URL YouTube", padding="10")
+        # URLs
+        url_frame = ttk.LabelFrame(main_frame, text="URLs YouTube (une par ligne)", padding="10")
         url_frame.pack(fill=tk.X, pady=(0, 15))
 
-        self.url_entry = ttk.Entry(url_frame, width=50)
-        self.url_entry.pack(fill=tk.X)
+        self.url_text = tk.Text(url_frame, height=4, width=50)
+        self.url_text.pack(fill=tk.X)
 
         # Options
         options_frame = ttk.LabelFrame(main_frame, text="Options", padding="10")
@@ -79,7 +119,7 @@ class YouTubeDownloaderGUI:
         self.info_btn = ttk.Button(buttons_frame, text="Voir les infos", command=self.show_info)
         self.info_btn.pack(side=tk.LEFT, padx=(0, 10))
 
-        self.download_btn = ttk.Button(buttons_frame, text="Télécharger", command=self.start_download)
+        self.download_btn = ttk.Button(buttons_frame, text="Ajouter à la file", command=self.start_download)
         self.download_btn.pack(side=tk.LEFT, padx=(0, 10))
 
         self.folder_btn = ttk.Button(buttons_frame, text="Ouvrir dossier", command=self.open_folder)
@@ -88,14 +128,25 @@ class YouTubeDownloaderGUI:
         # Progress
         self.progress_var = tk.StringVar(value="Prêt")
         self.progress_label = ttk.Label(main_frame, textvariable=self.progress_var)
-        self.progress_label.pack(fill=tk.X)
-
-        self.progress_bar = ttk.Progressbar(main_frame, mode="indeterminate")
-        self.progress_bar.pack(fill=tk.X, pady=(5, 15))
+        self.progress_label.pack(fill=tk.X, pady=(0, 5))
+
+        # File d'attente (zone défilante)
+        queue_frame = ttk.LabelFrame(main_frame, text="File d'attente", padding="10")
+        queue_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
+
+        canvas = tk.Canvas(queue_frame, highlightthickness=0, height=150)
+        scrollbar = ttk.Scrollbar(queue_frame, orient=tk.VERTICAL, command=canvas.yview)
+        self.queue_inner = ttk.Frame(canvas)
+        self.queue_inner.bind(
+            "<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        canvas.create_window((0, 0), window=self.queue_inner, anchor="nw")
+        canvas.configure(yscrollcommand=scrollbar.set)
+        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
         # Info
-        self.info_text = tk.Text(main_frame, height=6, state=tk.DISABLED)
-        self.info_text.pack(fill=tk.BOTH, expand=True)
+        self.info_text = tk.Text(main_frame, height=4, state=tk.DISABLED)
+        self.info_text.pack(fill=tk.X)
 
     def update_quality_options(self):
         if self.format_var.get() == "mp3":
@@ -105,22 +156,21 @@ class YouTubeDownloaderGUI:
             self.quality_combo['values'] = ["360p", "480p", "720p", "Meilleure qualité"]
             self.quality_var.set("Meilleure qualité")
 
-    def get_url(self):
-        url = self.url_entry.get().strip()
-        if not url:
-            messagebox.showwarning("Attention", "Veuillez entrer une URL YouTube")
-            return None
-        return url
+    def get_urls(self):
+        urls = [u.strip() for u in self.url_text.get(1.0, tk.END).splitlines() if u.strip()]
+        if not urls:
+            messagebox.showwarning("Attention", "Veuillez entrer au moins une URL YouTube")
+        return urls
 
     def show_info(self):
-        url = self.get_url()
-        if not url:
+        urls = self.get_urls()
+        if not urls:
             return
+        url = urls[0]
 
-        def fetch_info():
-            self.progress_var.set("Récupération des informations...")
-            self.progress_bar.start()
+        self.progress_var.set("Récupération des informations...")
 
+        def fetch_info():
             try:
                 info = self.downloader.get_video_info(url)
                 duration = info['duration']
@@ -130,58 +180,85 @@ class YouTubeDownloaderGUI:
 Chaîne: {info['channel']}
 Durée: {minutes}:{seconds:02d}
 """
-                self.update_info(info_text)
-                self.progress_var.set("Informations récupérées")
+                self.root.after(0, self.update_info, info_text)
+                self.root.after(0, self.progress_var.set, "Informations récupérées")
             except Exception as e:
-                self.progress_var.set("Erreur")
-                messagebox.showerror("Erreur", str(e))
-            finally:
-                self.progress_bar.stop()
+                self.root.after(0, self.progress_var.set, "Erreur")
+                self.root.after(0, messagebox.showerror, "Erreur", str(e))
 
         threading.Thread(target=fetch_info, daemon=True).start()
 
     def start_download(self):
-        if self.is_downloading:
-            return
-
-        url = self.get_url()
-        if not url:
+        """Ajoute les URLs à la file ; le pool exécute au plus MAX_WORKERS téléchargements"""
+        urls = self.get_urls()
+        if not urls:
             return
 
-        def download():
-            self.is_downloading = True
-            self.download_btn.config(state=tk.DISABLED)
-            self.progress_bar.start()
-
-            try:
-                format_type = self.format_var.get()
-                quality = self.quality_var.get()
-
-                if format_type == "mp3":
-                    q = quality.replace(" kbps", "")
-                    self.progress_var.set(f"Téléchargement MP3 ({quality})...")
-                    title = self.downloader.download_mp3(url, q)
-                    self.update_info(f"Téléchargé: {title}.mp3")
-                else:
-                    q_map = {"360p": "360", "480p": "480", "720p": "720", "Meilleure qualité": "best"}
-                    q = q_map.get(quality, "best")
-                    self.progress_var.set(f"Téléchargement MP4 ({quality})...")
-                    title = self.downloader.download_mp4(url, q)
-                    self.update_info(f"Téléchargé: {title}.mp4")
-
-                self.progress_var.set("Téléchargement terminé!")
-                messagebox.showinfo("Succès", "Téléchargement terminé!")
-
-            except Exception as e:
-                self.progress_var.set("Erreur")
-                messagebox.showerror("Erreur", str(e))
-
-            finally:
-                self.is_downloading = False
-                self.download_btn.config(state=tk.NORMAL)
-                self.progress_bar.stop()
-
-        threading.Thread(target=download, daemon=True).start()
+        format_type = self.format_var.get()
+        quality = self.quality_var.get()
+        if format_type == "mp3":
+            q = quality.replace(" kbps", "")
+        else:
+            q_map = {"360p": "360", "480p": "480", "720p": "720", "Meilleure qualité": "best"}
+            q = q_map.get(quality, "best")
+
+        for url in urls:
+            row_id = self.next_row_id
+            self.next_row_id += 1
+            self.rows[row_id] = QueueRow(self.queue_inner, url)
+            self.executor.submit(self._download_item, row_id, url, format_type, q)
+
+        self.url_text.delete(1.0, tk.END)
+        self._update_summary()
+
+    def _download_item(self, row_id, url, format_type, quality):
+        """Exécuté dans un worker : ne touche pas aux widgets, publie des mises à jour"""
+        def on_progress(event):
+            if event['status'] == 'finished':
+                status = "Conversion..." if format_type == "mp3" else "Finalisation..."
+            else:
+                speed = event['speed']
+                status = f"{event['percent'] or 0:.0f}%" + (f" - {speed / 1024 / 1024:.1f} Mo/s" if speed else "")
+            self._post_update(row_id, percent=event['percent'] or 0, status=status)
+
+        self._post_update(row_id, status="Téléchargement...")
+        try:
+            if format_type == "mp3":
+                title = self.downloader.download_mp3(url, quality, progress_callback=on_progress)
+                filename = f"{title}.mp3"
+            else:
+                title = self.downloader.download_mp4(url, quality, progress_callback=on_progress)
+                filename = f"{title}.mp4"
+            self._post_update(row_id, title=filename, percent=100, status="Terminé", done=True)
+        except Exception as e:
+            self._post_update(row_id, status="Erreur", error=str(e), done=True)
+
+    def _post_update(self, row_id, **update):
+        with self.updates_lock:
+            self.pending_updates.setdefault(row_id, {}).update(update)
+
+    def _flush_updates(self):
+        """Applique en une fois toutes les mises à jour accumulées depuis le dernier passage"""
+        with self.updates_lock:
+            updates, self.pending_updates = self.pending_updates, {}
+
+        for row_id, update in updates.items():
+            self.rows[row_id].apply(update)
+            if update.get('done'):
+                self.finished += 1
+                if 'error' in update:
+                    self.update_info(f"Erreur: {update['error']}")
+
+        if updates:
+            self._update_summary()
+        self.root.after(UPDATE_INTERVAL_MS, self._flush_updates)
+
+    def _update_summary(self):
+        total = len(self.rows)
+        if self.finished == total:
+            self.progress_var.set(f"Téléchargements terminés ({total})")
+        else:
+            self.progress_var.set(f"{self.finished}/{total} terminés")
 
     def update_info(self, text):
         self.info_text.config(state=tk.NORMAL)
@@ -202,7 +279,10 @@ Durée: {minutes}:{seconds:02d}
             subprocess.run(["xdg-open", folder])
 
     def run(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,30 @@
+"""
+Configuration gunicorn (chargée automatiquement par `gunicorn app:app`)
+
+PRELOAD=1 : l'application et yt-dlp sont chargés une seule fois dans le processus
+            maître ; les workers en héritent en copie sur écriture au fork.
+WARMUP=1  : sans préchargement, chaque worker importe yt-dlp en arrière-plan
+            après son démarrage, pour que le premier téléchargement n'attende pas.
+"""
+
+import gc
+import os
+import threading
+
+preload_app = os.environ.get('PRELOAD', '0') == '1'
+warmup = os.environ.get('WARMUP', '0') == '1'
+
+
+def when_ready(server):
+    if preload_app:
+        import app
+        app.warm_up()
+        # Les objets déjà chargés ne sont plus parcourus par le GC,
+        # qui sinon toucherait (et dupliquerait) leurs pages dans chaque worker
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    if warmup and not preload_app:
+        import app
+        threading.Thread(target=app.warm_up, daemon=True).start()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+YouTube Downloader - Profilage des tâches par échantillonnage
+
+Un thread relève la pile du thread profilé à intervalle régulier et compte
+les piles identiques. Le résultat est écrit au format « folded »
+(`a;b;c 42` par ligne), lu par flamegraph.pl, speedscope ou inferno.
+Aucun coût quand le profilage n'est pas demandé : rien n'est installé.
+"""
+
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+
+SAMPLE_INTERVAL = 0.01
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Echantillonne la pile d'un thread (par défaut celui qui appelle start())"""
+
+    def __init__(self, path, interval=SAMPLE_INTERVAL):
+        self.path = Path(path)
+        self.interval = interval
+        self.samples = Counter()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.target = None
+
+    def start(self, thread_id=None):
+        self.target = thread_id or threading.get_ident()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Arrête l'échantillonnage et écrit le profil, renvoie son chemin"""
+        self.stop_event.set()
+        self.thread.join()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return self.path
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+YouTube Downloader - Reprises et disjoncteurs pour les traitements par lots
+
+Les erreurs sont classées (temporaire, limitation de débit, définitive) ;
+les erreurs non définitives sont retentées avec un délai exponentiel aléatoire.
+Un disjoncteur par hôte suspend la file quand la source ne répond plus,
+puis laisse passer un seul essai avant de reprendre.
+"""
+
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+from scheduler import QuotaExceeded
+
+TRANSIENT = 'transient'
+THROTTLED = 'throttled'
+PERMANENT = 'permanent'
+
+MAX_ATTEMPTS = 4
+BASE_DELAY = 2.0
+THROTTLED_BASE_DELAY = 15.0
+MAX_DELAY = 120.0
+
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 60.0
+
+HTTP_STATUS_RE = re.compile(r'http error (\d{3})')
+THROTTLED_PATTERNS = ('too many requests', 'rate limit', 'rate-limit')
+TRANSIENT_PATTERNS = (
+    'timed out', 'timeout', 'connection reset', 'connection refused', 'connection aborted',
+    'temporary failure', 'remote end closed', 'incompleteread',
+    'name or service not known', 'network is unreachable',
+)
+
+
+def http_status(exc):
+    """Code HTTP à l'origine de l'erreur (cause yt-dlp ou message), None sinon"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        for attr in ('status', 'code'):
+            value = getattr(exc, attr, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+        exc_info = getattr(exc, 'exc_info', None)
+        exc = getattr(exc, 'cause', None) or (exc_info[1] if exc_info else None) or exc.__cause__
+    return None
+
+
+def classify_error(exc):
+    """Renvoie TRANSIENT, THROTTLED ou PERMANENT pour une exception de téléchargement :
+    5xx temporaire, 429 limitation de débit, autres 4xx définitives"""
+    if isinstance(exc, (QuotaExceeded, ValueError)):
+        return PERMANENT
+    message = str(exc).lower()
+    status = http_status(exc)
+    if status is None:
+        match = HTTP_STATUS_RE.search(message)
+        status = int(match.group(1)) if match else None
+    if status is not None:
+        if status == 429:
+            return THROTTLED
+        return TRANSIENT if status >= 500 else PERMANENT
+    if any(p in message for p in THROTTLED_PATTERNS):
+        return THROTTLED
+    if any(p in message for p in TRANSIENT_PATTERNS):
+        return TRANSIENT
+    return PERMANENT
+
+
+def backoff_delay(attempt, kind=TRANSIENT):
+    """Délai avant la tentative suivante : exponentiel, plafonné, avec gigue complète"""
+    base = THROTTLED_BASE_DELAY if kind == THROTTLED else BASE_DELAY
+    return random.uniform(0, min(MAX_DELAY, base * 2 ** attempt))
+
+
+def breaker_key(url):
+    """Hôte de la source, normalisé (youtu.be, m.youtube.com... -> youtube.com)"""
+    host = urllib.parse.urlparse(url).netloc.lower().split(':')[0]
+    for prefix in ('www.', 'm.', 'music.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if host == 'youtu.be':
+        host = 'youtube.com'
+    return host or 'unknown'
+
+
+class CircuitBreaker:
+    """Disjoncteur : fermé -> ouvert après `threshold` échecs -> semi-ouvert après `cooldown`"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def wait_time(self):
+        """Secondes à attendre avant d'essayer (0 = autorisé, éventuellement comme sonde)"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return 0
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.cooldown - time.monotonic()
+                if remaining > 0:
+                    return remaining
+                self.state = self.HALF_OPEN
+                self.probing = False
+            # Semi-ouvert : un seul essai à la fois, les autres patientent
+            if self.probing:
+                return 1.0
+            self.probing = True
+            return 0
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def snapshot(self):
+        with self.lock:
+            retry_in = 0
+            if self.state == self.OPEN:
+                retry_in = max(0, round(self.opened_at + self.cooldown - time.monotonic()))
+            return {'state': self.state, 'failures': self.failures, 'retry_in': retry_in}
+
+
+class BreakerRegistry:
+    """Un disjoncteur par hôte, partagé par toutes les tâches"""
+
+    def __init__(self):
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.breakers:
+                self.breakers[key] = CircuitBreaker()
+            return self.breakers[key]
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+YouTube Downloader - Ordonnanceur global des téléchargements
+
+Limite le nombre de téléchargements simultanés, de connexions et la bande passante totale,
+et répartit les créneaux équitablement entre les clients (round-robin).
+Le couloir prioritaire (vidéos seules) passe devant les traitements par lots et
+dispose d'un créneau supplémentaire : une vidéo seule n'attend jamais la fin
+d'une vidéo de playlist.
+Les téléchargements ne sont admis que si l'occupation disque projetée reste sous le quota.
+"""
+
+import shutil
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+LANE_PRIORITY = 'priority'
+LANE_BATCH = 'batch'
+LANES = (LANE_PRIORITY, LANE_BATCH)
+# Créneaux réservés au couloir prioritaire, au-delà de max_slots
+PRIORITY_EXTRA_SLOTS = 1
+
+
+class TokenBucket:
+    """Seau à jetons : `rate` octets/s, rafale maximale de `capacity` octets"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        """Retire `amount` jetons, en bloquant le temps nécessaire pour les regagner"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class _Ticket:
+    def __init__(self, owner, lane):
+        self.owner = owner
+        self.lane = lane
+        self.granted = False
+
+
+class DownloadScheduler:
+    """Attribue les créneaux de téléchargement de façon équitable entre clients"""
+
+    def __init__(self, max_slots=2, bandwidth_limit=0, max_connections=0):
+        self.cond = threading.Condition()
+        self.max_slots = max_slots
+        self.active = 0
+        self.bucket = None
+        self.bandwidth_limit = 0
+        self.max_connections = max_connections
+        # Par couloir : client -> file d'attente de tickets, dans l'ordre du round-robin
+        self.queues = {lane: OrderedDict() for lane in LANES}
+        self.configure(max_slots, bandwidth_limit, max_connections)
+
+    def configure(self, max_slots=None, bandwidth_limit=None, max_connections=None):
+        """Met à jour les limites (bandwidth_limit en octets/s, 0 = illimité)"""
+        with self.cond:
+            if max_slots is not None:
+                self.max_slots = max(1, int(max_slots))
+            if max_connections is not None:
+                self.max_connections = max(0, int(max_connections))
+            if bandwidth_limit is not None:
+                self.bandwidth_limit = max(0, int(bandwidth_limit))
+                self.bucket = TokenBucket(self.bandwidth_limit) if self.bandwidth_limit else None
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, owner, lane=LANE_BATCH, on_wait=None):
+        """Bloque jusqu'à l'obtention d'un créneau, le libère en sortie"""
+        ticket = _Ticket(owner, lane)
+        with self.cond:
+            self.queues[lane].setdefault(owner, deque()).append(ticket)
+            self._dispatch()
+            if not ticket.granted and on_wait:
+                on_wait(self.position(ticket))
+            while not ticket.granted:
+                self.cond.wait()
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.active -= 1
+                self._dispatch()
+
+    def position(self, ticket):
+        """Nombre de demandes en attente devant ce ticket (approximatif)"""
+        ahead = 0
+        for lane in LANES:
+            for queue in self.queues[lane].values():
+                if ticket in queue:
+                    return ahead + queue.index(ticket)
+                ahead += len(queue)
+        return ahead
+
+    def _dispatch(self):
+        """Accorde les créneaux libres : couloir prioritaire d'abord, puis round-robin"""
+        granted = False
+        while True:
+            ticket = self._next_ticket()
+            if ticket is None:
+                break
+            ticket.granted = True
+            self.active += 1
+            granted = True
+        if granted:
+            self.cond.notify_all()
+
+    def _next_ticket(self):
+        for lane in LANES:
+            queues = self.queues[lane]
+            limit = self.max_slots + (PRIORITY_EXTRA_SLOTS if lane == LANE_PRIORITY else 0)
+            if not queues or self.active >= limit:
+                continue
+            owner, queue = next(iter(queues.items()))
+            ticket = queue.popleft()
+            if queue:
+                # Un créneau par tour : le client passe en fin de tour
+                queues.move_to_end(owner)
+            else:
+                del queues[owner]
+            return ticket
+        return None
+
+    def ratelimit(self):
+        """Part de bande passante d'un téléchargement actif (option `ratelimit` de yt-dlp)"""
+        with self.cond:
+            if not self.bandwidth_limit:
+                return None
+            return max(1, self.bandwidth_limit // max(1, self.active))
+
+    def connections(self, wanted):
+        """Fragments simultanés accordés à un téléchargement actif : `wanted`,
+        dans la limite de sa part du nombre total de connexions (0 = illimité)"""
+        with self.cond:
+            if not self.max_connections:
+                return max(1, wanted)
+            return max(1, min(wanted, self.max_connections // max(1, self.active)))
+
+    def throttle(self, nbytes):
+        """Débite le seau global ; appelé depuis les hooks de progression"""
+        bucket = self.bucket
+        if bucket and nbytes > 0:
+            bucket.consume(nbytes)
+
+    def stats(self):
+        with self.cond:
+            return {
+                'max_slots': self.max_slots,
+                'active': self.active,
+                'waiting': {lane: sum(len(q) for q in self.queues[lane].values()) for lane in LANES},
+                'bandwidth_limit': self.bandwidth_limit,
+                'max_connections': self.max_connections,
+            }
+
+
+class QuotaExceeded(Exception):
+    """Le téléchargement ferait dépasser le quota ou l'espace disque"""
+
+
+class Reservation:
+    """Espace réservé par un téléchargement ; `written` est mis à jour pendant le transfert"""
+
+    def __init__(self, estimate):
+        self.estimate = estimate
+        self.written = 0
+
+    def remaining(self):
+        return max(0, self.estimate - self.written)
+
+
+class DiskQuota:
+    """Admission des téléchargements selon l'occupation disque projetée"""
+
+    def __init__(self, directory, limit=0):
+        self.directory = directory
+        self.limit = limit
+        self.reservations = set()
+        self.lock = threading.Lock()
+
+    def reserved(self):
+        """Octets encore à écrire par les téléchargements admis (déjà écrits : comptés par usage())"""
+        return sum(r.remaining() for r in self.reservations)
+
+    def usage(self):
+        """Octets occupés par les fichiers du dossier de téléchargement"""
+        total = 0
+        for f in self.directory.iterdir():
+            if f.is_file():
+                total += f.stat().st_size
+        return total
+
+    @contextmanager
+    def admit(self, estimate):
+        """Réserve `estimate` octets le temps du téléchargement, ou lève QuotaExceeded.
+        Renvoie la Reservation, dont l'appelant met à jour `written`."""
+        reservation = Reservation(estimate or 0)
+        estimate = reservation.estimate
+        with self.lock:
+            free = shutil.disk_usage(self.directory).free
+            reserved = self.reserved()
+            if estimate > free - reserved:
+                raise QuotaExceeded(
+                    f"Espace disque insuffisant ({estimate // 2**20} Mo requis, "
+                    f"{max(0, free - reserved) // 2**20} Mo libres)")
+            if self.limit:
+                projected = self.usage() + reserved + estimate
+                if projected > self.limit:
+                    raise QuotaExceeded(
+                        f"Quota disque dépassé ({projected // 2**20} Mo prévus, "
+                        f"limite {self.limit // 2**20} Mo)")
+            self.reservations.add(reservation)
+        try:
+            yield reservation
+        finally:
+            with self.lock:
+                self.reservations.discard(reservation)
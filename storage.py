@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+YouTube Downloader - Stockage des fichiers terminés
+
+LocalStorage garde les fichiers dans DOWNLOAD_DIR (servis par Flask).
+S3Storage et CloudinaryStorage envoient chaque fichier en morceaux vers un
+stockage objet, puis les clients sont redirigés vers une URL directe.
+
+Variables d'environnement:
+    STORAGE_BACKEND   local | s3 | cloudinary (défaut: cloudinary si CLOUDINARY_URL, sinon local)
+    S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL (MinIO ou autre stockage compatible S3)
+    STORAGE_URL_EXPIRES  durée de validité des URLs signées, en secondes
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Taille des morceaux envoyés (multipart S3, upload_large Cloudinary)
+CHUNK_SIZE = 8 * 1024 * 1024
+# Durée pendant laquelle un fichier absent du stockage distant n'est pas revérifié
+MISS_TTL = 60
+
+
+class LocalStorage:
+    """Aucun envoi : les fichiers restent servis depuis le disque local"""
+
+    name = 'local'
+
+    def upload(self, path):
+        pass
+
+    def url(self, filename):
+        return None
+
+    def delete(self, filename):
+        pass
+
+
+class RemoteStorage:
+    """Base des stockages distants : mémorise les fichiers envoyés et, pour
+    MISS_TTL secondes, ceux absents (évite une requête distante à chaque accès)"""
+
+    def __init__(self):
+        self.uploaded = set()
+        self.missing = {}
+
+    def mark_uploaded(self, filename):
+        self.uploaded.add(filename)
+        self.missing.pop(filename, None)
+
+    def mark_missing(self, filename):
+        self.uploaded.discard(filename)
+        self.missing[filename] = time.monotonic() + MISS_TTL
+
+    def url(self, filename):
+        if filename not in self.uploaded:
+            if self.missing.get(filename, 0) > time.monotonic():
+                return None
+            # Envoyé par un autre worker ou avant un redémarrage ?
+            try:
+                exists = self.exists(filename)
+            except Exception:
+                exists = False
+            if not exists:
+                self.mark_missing(filename)
+                return None
+            self.mark_uploaded(filename)
+        return self.direct_url(filename)
+
+
+class S3Storage(RemoteStorage):
+    """Stockage compatible S3 (AWS, MinIO...) avec URLs présignées"""
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, expires=3600):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 nécessite boto3 (pip install boto3)")
+
+        super().__init__()
+
+        # Les stockages auto-hébergés comme MinIO n'acceptent que l'adressage par chemin
+        config = Config(s3={'addressing_style': 'path'}) if endpoint_url else None
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, config=config)
+        self.transfer_config = TransferConfig(multipart_threshold=CHUNK_SIZE, multipart_chunksize=CHUNK_SIZE)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.expires = expires
+
+    def key(self, filename):
+        return f"{self.prefix}{filename}"
+
+    def upload(self, path):
+        self.client.upload_file(str(path), self.bucket, self.key(path.name), Config=self.transfer_config)
+        self.mark_uploaded(path.name)
+
+    def exists(self, filename):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(filename))
+        except self.client.exceptions.ClientError:
+            return False
+        return True
+
+    def direct_url(self, filename):
+        return self.client.generate_presigned_url('get_object', Params={
+            'Bucket': self.bucket,
+            'Key': self.key(filename),
+            'ResponseContentDisposition': f'attachment; filename="{filename}"',
+        }, ExpiresIn=self.expires)
+
+    def delete(self, filename):
+        self.mark_missing(filename)
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(filename))
+
+
+class CloudinaryStorage(RemoteStorage):
+    """Stockage Cloudinary (fichiers 'raw'), configuré par CLOUDINARY_URL"""
+
+    name = 'cloudinary'
+
+    def __init__(self, folder='youtube-downloader'):
+        import cloudinary
+        import cloudinary.api
+        import cloudinary.uploader
+        import cloudinary.utils
+
+        super().__init__()
+        self.cloudinary = cloudinary
+        self.folder = folder
+
+    def public_id(self, filename):
+        return f"{self.folder}/{filename}"
+
+    def upload(self, path):
+        self.cloudinary.uploader.upload_large(
+            str(path), resource_type='raw', public_id=self.public_id(path.name),
+            overwrite=True, chunk_size=CHUNK_SIZE)
+        self.mark_uploaded(path.name)
+
+    def exists(self, filename):
+        # API d'administration (quota horaire) : appelée au plus une fois par MISS_TTL
+        try:
+            self.cloudinary.api.resource(self.public_id(filename), resource_type='raw')
+        except self.cloudinary.exceptions.NotFound:
+            return False
+        return True
+
+    def direct_url(self, filename):
+        return self.cloudinary.utils.cloudinary_url(
+            self.public_id(filename), resource_type='raw', secure=True)[0]
+
+    def delete(self, filename):
+        self.mark_missing(filename)
+        self.cloudinary.uploader.destroy(self.public_id(filename), resource_type='raw')
+
+
+def create_storage():
+    """Instancie le stockage choisi par les variables d'environnement"""
+    default = 'cloudinary' if os.environ.get('CLOUDINARY_URL') else 'local'
+    backend = os.environ.get('STORAGE_BACKEND', default)
+    expires = int(os.environ.get('STORAGE_URL_EXPIRES', '3600'))
+
+    if backend == 's3':
+        return S3Storage(
+            os.environ['S3_BUCKET'],
+            prefix=os.environ.get('S3_PREFIX', ''),
+            endpoint_url=os.environ.get('S3_ENDPOINT_URL') or None,
+            expires=expires,
+        )
+    if backend == 'cloudinary':
+        return CloudinaryStorage()
+    return LocalStorage()
+
+
+class Uploader:
+    """Envoie les fichiers en arrière-plan pendant que le téléchargement suivant démarre"""
+
+    def __init__(self, storage, workers=2):
+        self.storage = storage
+        self.executor = ThreadPoolExecutor(max_workers=workers) if storage.name != 'local' else None
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def submit(self, path):
+        """Programme l'envoi de `path`, renvoie un Future (None en stockage local)"""
+        if self.executor is None:
+            return None
+        with self.lock:
+            self.pending.add(path.name)
+        return self.executor.submit(self._upload, path)
+
+    def url(self, filename):
+        """URL directe du fichier, None s'il faut le servir localement (envoi en cours compris)"""
+        with self.lock:
+            if filename in self.pending:
+                return None
+        return self.storage.url(filename)
+
+    def _upload(self, path):
+        try:
+            self.storage.upload(path)
+            return True
+        except Exception as e:
+            print(f"Erreur d'envoi {path.name}: {e}")
+            self.storage.mark_missing(path.name)
+            return False
+        finally:
+            with self.lock:
+                self.pending.discard(path.name)
+
+
+_uploader = None
+_uploader_lock = threading.Lock()
+
+
+def get_uploader():
+    """Stockage et envoi créés à la première utilisation (imports différés)"""
+    global _uploader
+    with _uploader_lock:
+        if _uploader is None:
+            _uploader = Uploader(create_storage())
+        return _uploader
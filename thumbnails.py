@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+YouTube Downloader - Cache local des miniatures
+
+Les miniatures sont servies par /thumb/<id> au lieu de laisser chaque navigateur
+les charger depuis i.ytimg.com. Elles sont gardées sur disque dans un cache LRU
+de taille bornée ; les demandes simultanées d'une même miniature ne déclenchent
+qu'un seul téléchargement. La variante amont dépend de la largeur demandée
+(mqdefault 320 px pour les vignettes, maxresdefault sinon) ; les versions réduites
+(Pillow, optionnel) sont mises en cache comme les originales.
+
+Chaque worker gunicorn tient son propre index du dossier partagé : un fichier
+évincé par un autre worker est simplement retéléchargé.
+
+Variables d'environnement:
+    THUMB_CACHE_MB   taille maximale du cache (défaut: 64)
+    THUMB_UPSTREAM   source des miniatures, ex. http://127.0.0.1:8000/{id}.jpg
+                     (défaut: i.ytimg.com)
+"""
+
+import io
+import os
+import re
+import threading
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+VIDEO_ID_RE = re.compile(r'[A-Za-z0-9_-]{11}')
+YTIMG_RE = re.compile(r'ytimg\.com/vi(?:_webp)?/([A-Za-z0-9_-]{11})/')
+
+# Variantes essayées dans l'ordre : maxresdefault n'existe pas pour toutes les vidéos
+YTIMG_VARIANTS = ('maxresdefault.jpg', 'mqdefault.jpg')
+# Jusqu'à cette largeur, la variante mqdefault (320x180) suffit
+SMALL_WIDTH = 320
+YTIMG_SMALL_VARIANTS = ('mqdefault.jpg',)
+# Largeurs de réduction proposées (une largeur demandée est arrondie à la suivante)
+THUMB_WIDTHS = (120, 240, 320, 480, 640)
+FETCH_TIMEOUT = 10
+
+
+class ThumbnailNotFound(Exception):
+    """Aucune miniature disponible pour cette vidéo"""
+
+
+def thumb_url(video_id=None, fallback=''):
+    """URL locale /thumb/<id> d'une vidéo YouTube, sinon `fallback`.
+    L'identifiant est repris de l'URL i.ytimg.com de `fallback` s'il n'est pas donné."""
+    if not video_id and fallback:
+        match = YTIMG_RE.search(fallback)
+        video_id = match.group(1) if match else None
+    if video_id and VIDEO_ID_RE.fullmatch(video_id):
+        return f"/thumb/{video_id}"
+    return fallback
+
+
+def _download(url):
+    request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+        return response.read()
+
+
+def fetch_youtube(video_id, width=None):
+    """Télécharge depuis i.ytimg.com la plus petite variante d'au moins `width` pixels"""
+    small = width and width <= SMALL_WIDTH
+    for variant in YTIMG_SMALL_VARIANTS if small else YTIMG_VARIANTS:
+        try:
+            return _download(f"https://i.ytimg.com/vi/{video_id}/{variant}")
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                raise
+    raise ThumbnailNotFound(video_id)
+
+
+def upstream_fetcher(template):
+    """Fetcher lisant une source alternative (`{id}` remplacé par l'identifiant)"""
+    def fetch(video_id, width=None):
+        try:
+            return _download(template.format(id=video_id))
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise ThumbnailNotFound(video_id)
+            raise
+    return fetch
+
+
+def can_resize():
+    try:
+        import PIL.Image  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resize(data, width):
+    """Réduit l'image à `width` pixels de large (JPEG), sans jamais l'agrandir"""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    if image.width <= width:
+        return data
+    image.thumbnail((width, image.height * width // image.width + 1))
+    output = io.BytesIO()
+    image.convert('RGB').save(output, 'JPEG', quality=80, optimize=True)
+    return output.getvalue()
+
+
+class ThumbnailCache:
+    """Cache LRU sur disque de `max_bytes` octets, alimenté par
+    `fetcher(video_id, width) -> bytes` (width None = la plus grande variante)"""
+
+    def __init__(self, directory, max_bytes=64 * 2**20, fetcher=fetch_youtube):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.fetcher = fetcher
+        # Pillow n'est importé qu'à la première demande de réduction
+        self.resizable = None
+        # clé -> taille, du moins au plus récemment utilisé
+        self.entries = OrderedDict()
+        self.total = 0
+        self.inflight = {}
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def get(self, video_id, width=None):
+        """Renvoie (octets JPEG, etag) de la miniature, réduite si `width` est donné"""
+        small = bool(width) and width <= SMALL_WIDTH
+        source_width = SMALL_WIDTH if small else None
+        width = self._snap(width)
+        if width == source_width:
+            width = None
+        key = f"{video_id}_w{width}" if width else f"{video_id}_mq" if small else video_id
+
+        data = self._read(key)
+        if data is None:
+            if width:
+                # Réduction de la variante amont mise en cache
+                produce = lambda: resize(self.get(video_id, source_width)[0], width)
+            else:
+                produce = lambda: self.fetcher(video_id, source_width)
+            data = self._coalesce(key, produce)
+        return data, f"{key}-{len(data):x}"
+
+    def _snap(self, width):
+        if not width:
+            return None
+        if self.resizable is None:
+            self.resizable = can_resize()
+        if not self.resizable:
+            return None
+        return next((w for w in THUMB_WIDTHS if w >= width), None)
+
+    def _path(self, key):
+        return self.directory / f"{key}.jpg"
+
+    def _load(self):
+        """Reconstruit l'index depuis le disque (au premier accès, pas à l'import)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = [(f, f.stat()) for f in self.directory.glob('*.jpg')]
+        for f, stat in sorted(files, key=lambda x: x[1].st_mtime):
+            self.entries[f.stem] = stat.st_size
+            self.total += stat.st_size
+        self.loaded = True
+        self._evict()
+
+    def _read(self, key):
+        with self.lock:
+            if not self.loaded:
+                self._load()
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            # L'ordre LRU survit aux redémarrages
+            os.utime(path)
+            return data
+        except OSError:
+            with self.lock:
+                self.total -= self.entries.pop(key, 0)
+            return None
+
+    def _coalesce(self, key, produce):
+        """Un seul téléchargement par clé : les demandes concurrentes attendent son résultat"""
+        with self.lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            # Une autre demande a pu terminer entre notre lecture et notre inscription
+            data = self._read(key)
+            if data is None:
+                data = produce()
+                self._store(key, data)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+    def _store(self, key, data):
+        path = self._path(key)
+        tmp = path.with_name(f"{key}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        with self.lock:
+            self.total += len(data) - self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total -= size
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+
+def create_thumbnail_cache(directory):
+    """Instancie le cache selon les variables d'environnement"""
+    upstream = os.environ.get('THUMB_UPSTREAM')
+    return ThumbnailCache(
+        directory,
+        max_bytes=int(os.environ.get('THUMB_CACHE_MB', '64')) * 2**20,
+        fetcher=upstream_fetcher(upstream) if upstream else fetch_youtube,
+    )